@@ -0,0 +1,204 @@
+import os
+import logging
+import fitz  # PyMuPDF
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# 卖家中心的"保存条码"按钮并不请求后端接口：条码PDF由页面里的jsPDF在浏览器端生成
+# （PDF的Producer为"jsPDF 2.5.1"），内容是labelCode的Code128条码加上SKC、规格、SKU和产地。
+# 这里直接用pageQuery返回的数据按相同版式生成PDF，不再需要驱动浏览器。
+
+MM = 72 / 25.4
+
+# 条码页面版式（单位：pt），取自卖家中心导出的70x20mm条码PDF
+PAGE_WIDTH = 70 * MM
+PAGE_HEIGHT = 20 * MM
+BORDER_RECT = fitz.Rect(1.9 * MM, 1.9 * MM, 68.1 * MM, 18.1 * MM)
+BORDER_WIDTH = 0.2 * MM
+BARS_RECT = fitz.Rect(7 * MM, 6 * MM, 63 * MM, 14 * MM)
+TEXT_LEFT = 5 * MM
+TEXT_RIGHT = 64.3 * MM
+SKC_BASELINE, SKC_FONT_SIZE = 12.34, 4.5
+SPEC_BASELINE, SPEC_FONT_SIZE = 12.77, 5.0
+SKU_BASELINE, SKU_FONT_SIZE = 48.2, 6.0
+
+# Code128字符集的条/空宽度，下标即符号值（0-105），终止符单独列出
+CODE128_PATTERNS = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232",
+]
+CODE128_STOP = "2331112"
+CODE_A, START_B, START_C = 101, 104, 105
+
+
+def code128_values(data: str) -> List[int]:
+    """
+    把字符串编码为Code128符号值（含起始符和校验位，不含终止符）
+    纯数字使用Code C两位一组，奇数位时最后一位切换到Code A，与页面生成的条码一致；其他内容使用Code B
+    """
+    if data.isdigit() and len(data) >= 2:
+        values = [START_C]
+        even_length = len(data) - len(data) % 2
+        values += [int(data[i:i + 2]) for i in range(0, even_length, 2)]
+        if len(data) % 2:
+            values += [CODE_A, ord(data[-1]) - 32]
+    else:
+        values = [START_B] + [ord(ch) - 32 for ch in data]
+        if any(v < 0 or v > 95 for v in values[1:]):
+            raise ValueError(f"Code128 B无法编码: {data}")
+
+    checksum = values[0] + sum(i * v for i, v in enumerate(values[1:], 1))
+    return values + [checksum % 103]
+
+
+def code128_bars(data: str):
+    """
+    计算条码中每根黑条的位置
+    :return: ([(起始模块, 宽度模块数), ...], 总模块数)
+    """
+    widths = ''.join(CODE128_PATTERNS[v] for v in code128_values(data)) + CODE128_STOP
+    bars = []
+    position = 0
+    for i, width in enumerate(widths):
+        width = int(width)
+        if i % 2 == 0:  # 偶数位是黑条，奇数位是空白
+            bars.append((position, width))
+        position += width
+    return bars, position
+
+
+def spec_text(record: Dict) -> str:
+    """拼接英文规格，例如 "Mocha Brown-1pc" """
+    specs = (record.get('productSkuSpecI18nMap') or {}).get('en') or record.get('productSkuSpecList') or []
+    return '-'.join(spec.get('specName', '') for spec in specs if spec.get('specName'))
+
+
+def origin_text(record: Dict) -> str:
+    country = (record.get('productOrigin') or {}).get('countryName') or 'China'
+    return f"Made In {country}"
+
+
+def _insert_text(page, x, baseline, text, font_size, align_right=False):
+    """写入一行文字，非拉丁字符使用内置中文字体"""
+    fontname = "helv" if text.isascii() else "china-s"
+    if align_right:
+        x -= fitz.get_text_length(text, fontname=fontname, fontsize=font_size)
+    page.insert_text((x, baseline), text, fontname=fontname, fontsize=font_size, color=(0, 0, 0))
+
+
+def render_barcode_pdf(record: Dict, output_path: str) -> None:
+    """
+    按卖家中心的版式生成单个SKU的条码PDF
+    :param record: pageQuery返回的pageItems记录
+    :param output_path: 输出文件路径
+    """
+    label_code_vo = record['labelCodeVO']
+    bars, total_modules = code128_bars(str(label_code_vo['labelCode']))
+    module_width = BARS_RECT.width / total_modules
+
+    doc = fitz.open()
+    try:
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        shape = page.new_shape()
+        for start, width in bars:
+            x0 = BARS_RECT.x0 + start * module_width
+            shape.draw_rect(fitz.Rect(x0, BARS_RECT.y0, x0 + width * module_width, BARS_RECT.y1))
+        shape.finish(color=None, fill=(0, 0, 0), width=0)
+        shape.draw_rect(BORDER_RECT)
+        shape.finish(color=(0, 0, 0), width=BORDER_WIDTH)
+        shape.commit()
+
+        _insert_text(page, TEXT_LEFT, SKC_BASELINE, str(label_code_vo.get('productSkcId', '')), SKC_FONT_SIZE)
+        _insert_text(page, TEXT_RIGHT, SPEC_BASELINE, spec_text(record), SPEC_FONT_SIZE, align_right=True)
+        _insert_text(page, TEXT_LEFT, SKU_BASELINE, str(label_code_vo['productSkuId']), SKU_FONT_SIZE)
+        _insert_text(page, TEXT_RIGHT, SKU_BASELINE, origin_text(record), SKU_FONT_SIZE, align_right=True)
+
+        doc.save(output_path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+
+class ApiBarcodeHandler:
+    """不经过浏览器，直接用已登录的session获取SKU数据并批量生成条码PDF"""
+
+    def __init__(self, sku_handler, store=None, output_dir: str = "barcodes", max_workers: int = 4,
+                 index=None):
+        """
+        :param sku_handler: SkuHandler实例，用于并发获取pageQuery数据
+        :param store: 可选的SkuStore，已同步的记录直接从本地读取，不再请求接口
+        :param output_dir: 条码PDF输出目录
+        :param max_workers: 获取SKU数据的并发线程数
+        :param index: 可选的BarcodeIndex，内容未变化的条码不重复保存
+        """
+        self.sku_handler = sku_handler
+        self.store = store
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.index = index
+        self.logger = logging.getLogger('sku_crawler')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+    def load_records(self, sku_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        获取SKU记录
+        :param sku_ids: 需要的productSkuId，为None时返回全部SKU
+        :return: {productSkuId: pageItems记录}
+        """
+        wanted = set(str(sku_id) for sku_id in sku_ids) if sku_ids is not None else None
+        records = {}
+
+        if self.store is not None and wanted:
+            for sku_id in wanted:
+                record = self.store.get_record(sku_id)
+                if record:
+                    records[sku_id] = record
+            if len(records) == len(wanted):
+                return records
+
+        for record in self.sku_handler.iter_sku_records(max_workers=self.max_workers):
+            sku_id = str(record['labelCodeVO']['productSkuId'])
+            if wanted is None or sku_id in wanted:
+                records[sku_id] = record
+            if wanted is not None and len(records) == len(wanted):
+                break
+        return records
+
+    def export_barcodes(self, sku_ids: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        批量生成条码PDF并写入输出目录
+        PyMuPDF不支持多线程，接口请求并发进行，PDF生成在当前线程依次完成（单个仅需几毫秒）
+        :param sku_ids: 需要生成的productSkuId，为None时生成全部SKU
+        :return: {productSkuId: PDF路径}
+        """
+        records = self.load_records(sku_ids)
+        if sku_ids is not None:
+            missing = set(str(sku_id) for sku_id in sku_ids) - set(records)
+            if missing:
+                print(f"以下SKU未找到数据: {sorted(missing)}")
+
+        saved = {}
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for sku_id, record in records.items():
+            output_path = os.path.join(self.output_dir, f"sku_{sku_id}_{timestamp}.pdf")
+            try:
+                render_barcode_pdf(record, output_path)
+                if self.index is not None:
+                    output_path = self.index.add(sku_id, output_path)
+                saved[sku_id] = output_path
+            except Exception as e:
+                print(f"生成SKU {sku_id} 的条码失败: {str(e)}")
+
+        if self.index is not None:
+            self.index.save()
+        print(f"共生成 {len(saved)} 个条码PDF")
+        return saved
@@ -1,29 +1,105 @@
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 import time
 import os
 from datetime import datetime
+from selenium.webdriver.support.ui import WebDriverWait
+from cdp_capture import PdfCapture, write_pdf
+from barcode_journal import ROW_SKU_PATTERN
+from tracing import span, traced
+from wait_policy import WaitPolicy
+
+ROW_SKC_PATTERN = r'SKC\s*(?:ID)?\s*[:：]?\s*(\d{6,})'
+
+# 一次调用取出当前页所有条码行和分页状态，代替逐行逐字段的WebDriver查询
+# 返回 {rows: [{index, sku, skc, row, button}], pager: {current, total, has_next}}，row和button为元素句柄
+EXTRACT_PAGE_JS = """
+var skuPattern = new RegExp(arguments[0]);
+var skcPattern = new RegExp(arguments[1]);
+var rows = [];
+var seen = new Set();
+document.querySelectorAll('a span').forEach(function(span) {
+    if (span.textContent !== '查看条码') return;
+    var button = span.closest('a');
+    var cell = button && button.closest('td');
+    var row = cell && cell.parentElement;
+    if (!row || seen.has(row)) return;
+    seen.add(row);
+    var text = row.innerText || '';
+    var sku = text.match(skuPattern);
+    var skc = text.match(skcPattern);
+    rows.push({
+        index: rows.length + 1,
+        sku: sku ? sku[1] : '',
+        skc: skc ? skc[1] : '',
+        row: row,
+        button: button
+    });
+});
+
+var numbers = [];
+document.querySelectorAll('li[class*="PGT_pagerItem"]').forEach(function(li) {
+    var n = parseInt(li.textContent.trim(), 10);
+    if (!isNaN(n)) numbers.push(n);
+});
+var active = document.querySelector('li[class*="PGT_pagerItemActive"]');
+var next = document.querySelector('li[class*="PGT_next"]');
+return {
+    rows: rows,
+    pager: {
+        current: active ? parseInt(active.textContent.trim(), 10) || null : null,
+        total: numbers.length ? Math.max.apply(null, numbers) : 1,
+        has_next: !!next && next.className.indexOf('PGT_disabled') < 0
+    }
+};
+"""
+
+# 条码弹窗中所有"标签-值"字段，一次调用返回 {SKC: ..., SKU: ...}
+MODAL_LABELS_JS = """
+var values = {};
+document.querySelectorAll('div[class*="label-value-module__label___"]').forEach(function(label) {
+    var value = label.nextElementSibling;
+    if (value) values[label.textContent.trim()] = value.textContent.trim();
+});
+return values;
+"""
 
 class BarcodeHandler:
-    def __init__(self, driver, wait):
+    def __init__(self, driver, wait, capture=None, journal=None, index=None, output_dir='barcodes', waits=None):
         self.driver = driver
         self.wait = wait
+        self.waits = waits or WaitPolicy(driver)
+        self.output_dir = output_dir
+        # 断点记录（BarcodeJournal），为None时不跳过也不记录
+        self.journal = journal
+        # 条码内容索引（BarcodeIndex），内容与已有文件相同的下载不重复保存
+        self.index = index
+        self.last_sku = ""
+        # 通过CDP注入的钩子直接拿到页面生成的PDF字节
+        self.capture = capture or PdfCapture(driver).install()
         self.setup_dirs()
         
     def setup_dirs(self):
         """创建保存条码的目录"""
-        if not os.path.exists('barcodes'):
-            os.makedirs('barcodes')
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
             
-    def get_barcode(self, row):
-        """获取并保存条码"""
+    @traced("barcode.sku", cat="sku")
+    def get_barcode(self, row, view_button=None):
+        """
+        获取并保存条码，成功返回保存的文件路径，失败返回False
+        :param row: 商品行元素
+        :param view_button: extract_page取到的"查看条码"按钮，为None时在行内查找
+        """
         try:
             # 使用JavaScript滚动到当前行
+            # scrollIntoView是同步滚动，弹窗由注入脚本屏蔽，不需要额外等待
             self.driver.execute_script("arguments[0].scrollIntoView(true);", row)
-            time.sleep(1)  # 等待滚动完成
             
             # 点击"查看条码"按钮
-            view_button = row.find_element(By.XPATH, ".//a[.//span[text()='查看条码']]")
+            if view_button is None:
+                view_button = row.find_element(By.XPATH, ".//a[.//span[text()='查看条码']]")
             view_button.click()
             print("已点击查看条码按钮")
             
@@ -41,14 +117,17 @@ class BarcodeHandler:
                 pass  # 如果没有找到翻译弹窗，继续正常流程
             
             # 等待弹窗出现
-            self.wait.until(
-                EC.presence_of_element_located((By.CLASS_NAME, "label-detail-modal_content__1Ib9A"))
-            )
+            with span("barcode.modal_wait"):
+                self.wait.until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "label-detail-modal_content__1Ib9A"))
+                )
             print("条码弹窗已出现")
             
             # 获取商品信息
-            skc = self.get_text_by_label("SKC")
-            sku = self.get_text_by_label("SKU")
+            labels = self.get_modal_labels()
+            skc = labels.get("SKC", "")
+            sku = labels.get("SKU", "")
+            self.last_sku = sku
             print(f"商品信息 - SKC: {skc}, SKU: {sku}")
             
             # 点击"打印条码"按钮
@@ -58,117 +137,232 @@ class BarcodeHandler:
                     (By.XPATH, "//button[.//span[text()='保存条码']]")
                 )
             )
+            self.capture.reset()
             for attempt in range(3):  # 尝试3次
                 try:
                     print_button.click()
                     break  # 如果点击成功，跳出循环
                 except Exception as e:
                     print(f"点击保存条码按钮失败，重试中... ({attempt + 1}/3)")
-                    time.sleep(3)  # 每次重试前等待2秒
+                    # 等按钮重新可点击（遮挡消失）后再重试
+                    self.waits.until("保存条码按钮可点击", EC.element_to_be_clickable(print_button),
+                                     timeout=1, required=False)
             else:
                 raise Exception("点击保存条码按钮失败，已重试3次")
             print("已点击保存条码按钮")
             
-            # 等待 PDF 生成
-            time.sleep(1)  # 等待 PDF 生成和下载
-            
-            # 重命名最新下载的 PDF 文件
-            self.rename_latest_pdf(sku)
+            # 等待页面生成PDF，拿到字节后立即保存
+            with span("barcode.download"):
+                pdf_data = self.capture.wait_for_pdf()
+            if not pdf_data:
+                raise Exception("未捕获到生成的PDF")
+            with span("barcode.save"):
+                path = self.save_pdf(sku, pdf_data)
             
             # 关闭弹窗
             close_button = self.driver.find_element(
                 By.XPATH, "//button[.//span[text()='取消']]"
             )
             close_button.click()
+            # 等弹窗关闭后再处理下一行，代替每行之前的固定等待
+            try:
+                self.wait.until(EC.invisibility_of_element_located((By.XPATH, "//button[.//span[text()='保存条码']]")))
+            except Exception:
+                print("等待弹窗关闭超时")
             print("已关闭弹窗")
             
-            return True
+            return path
             
         except Exception as e:
             print(f"获取条码时出错: {str(e)}")
             return False
             
-    def get_text_by_label(self, label):
-        """根据标签获取文本值"""
+    def get_modal_labels(self):
+        """一次读取条码弹窗中的所有字段"""
         try:
-            element = self.driver.find_element(
-                By.XPATH,
-                f"//div[contains(@class, 'label-value-module__label___') and text()='{label}']/following-sibling::div"
-            )
-            return element.text.strip()
-        except:
-            return ""
+            return self.driver.execute_script(MODAL_LABELS_JS) or {}
+        except Exception:
+            return {}
+
+    def extract_page(self):
+        """
+        一次execute_script取出当前页的所有条码行和分页状态
+        :return: {'rows': [{'index', 'sku', 'skc', 'row', 'button'}], 'pager': {'current', 'total', 'has_next'}}
+        """
+        return self.driver.execute_script(EXTRACT_PAGE_JS, ROW_SKU_PATTERN.pattern, ROW_SKC_PATTERN)
+
+    def save_pdf(self, sku, pdf_data):
+        """将捕获到的PDF保存到条码目录"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        new_path = os.path.join(self.output_dir, f"sku_{sku}_{timestamp}.pdf")
+        # 多个标签页并发保存时，同一秒内的同名文件追加序号
+        counter = 1
+        while os.path.exists(new_path):
+            new_path = os.path.join(self.output_dir, f"sku_{sku}_{timestamp}_{counter}.pdf")
+            counter += 1
+        write_pdf(pdf_data, new_path)
+        print(f"PDF 已保存: {new_path}")
+        if self.index is not None:
+            new_path = self.index.add(sku, new_path)
+        return new_path
             
-    def rename_latest_pdf(self, sku):
-        """重命名最新下载的 PDF 文件"""
+    def process_current_page(self, page=None):
+        """
+        处理当前页的所有商品，返回找到的商品数
+        :param page: 当前页码，用于断点记录
+        """
+        # 获取当前页面上所有包含"查看条码"按钮的行
+        rows = self.extract_page()['rows']
+        print(f"当前页找到 {len(rows)} 个商品")
+        
+        for item in rows:
+            self.process_row(item, page)
+        if self.journal and page is not None and rows:
+            self.journal.mark_page(page)
+        return len(rows)
+
+    def process_row(self, item, page=None):
+        """
+        处理单个商品行：已有完整PDF的SKU直接跳过，失败的行记入重试队列
+        :param item: extract_page返回的行数据
+        """
+        index = item['index']
+        row_sku = item['sku']
+        if row_sku and self.journal and self.journal.is_done(row_sku):
+            print(f"\n第 {index} 个商品 SKU {row_sku} 已有条码，跳过")
+            return True
+        
+        print(f"\n处理第 {index} 个商品...")
+        self.last_sku = ""
+        path = self.get_barcode(item['row'], item['button'])
+        if self.journal:
+            if path:
+                self.journal.mark_done(self.last_sku or row_sku, path, page, index)
+            else:
+                self.journal.mark_failed(page, index, row_sku or self.last_sku)
+        return bool(path)
+
+    def current_page(self):
+        """从分页器读取当前页码"""
         try:
-            # 获取下载目录
-            download_dir = os.path.expanduser("~/Downloads")
-            
-            # 获取最新的 PDF 文件
-            files = [f for f in os.listdir(download_dir) if f.endswith('.pdf')]
-            if not files:
-                print("未找到下载的 PDF 文件")
-                return
-                
-            files.sort(key=lambda x: os.path.getmtime(os.path.join(download_dir, x)))
-            latest_pdf = files[-1]
-            
-            # 构造新文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_name = f"sku_{sku}_{timestamp}.pdf"
-            
-            # 移动并重命名文件
-            old_path = os.path.join(download_dir, latest_pdf)
-            new_path = os.path.join('barcodes', new_name)
-            
-            os.rename(old_path, new_path)
-            print(f"PDF 已保存: {new_path}")
-            
+            return self.extract_page()['pager']['current']
+        except Exception:
+            return None
+
+    def go_to_page(self, page):
+        """
+        跳转到指定页：分页器上有该页码时直接点击，否则在分页器的跳转输入框中输入页码，
+        都没有时向目标方向逐页翻；每次操作后等到分页器的当前页变化
+        :return: 是否到达指定页
+        """
+        for _ in range(200):
+            current = self.current_page()
+            if current is None or current == page:
+                return current == page
+            try:
+                items = self.driver.find_elements(
+                    By.XPATH, f"//li[contains(@class, 'PGT_pagerItem') and normalize-space(text())='{page}']"
+                )
+                jumpers = [] if items else self.driver.find_elements(By.CSS_SELECTOR, '[class*="PGT_"] input')
+                if jumpers:
+                    jumpers[0].send_keys(Keys.CONTROL, 'a')
+                    jumpers[0].send_keys(str(page), Keys.ENTER)
+                    WebDriverWait(self.driver, 10).until(lambda d: self.current_page() != current)
+                    continue
+                direction = 'PGT_next' if current < page else 'PGT_prev'
+                target = items[0] if items else self.driver.find_element(
+                    By.XPATH, f"//li[contains(@class, '{direction}') and not(contains(@class, 'PGT_disabled'))]"
+                )
+                self.driver.execute_script("arguments[0].scrollIntoView(true);", target)
+                target.click()
+                WebDriverWait(self.driver, 10).until(lambda d: self.current_page() != current)
+            except Exception as e:
+                print(f"跳转到第 {page} 页失败: {str(e)}")
+                return False
+        return False
+
+    def retry_failed(self):
+        """在列表末尾统一重试断点记录中失败的行"""
+        if not self.journal:
+            return 0
+        pending = self.journal.pending_retries()
+        if not pending:
+            return 0
+        print(f"\n重试 {len(pending)} 个失败的商品...")
+        recovered = 0
+        for page, index, sku in pending:
+            if not self.go_to_page(page):
+                continue
+            rows = self.extract_page()['rows']
+            # 优先按SKU找行，列表有变动时行号可能已经对不上
+            matched = [item for item in rows if sku and item['sku'] == sku]
+            if not matched and 0 < index <= len(rows):
+                matched = [rows[index - 1]]
+            if matched and self.process_row(matched[0], page):
+                recovered += 1
+        print(f"重试完成，成功 {recovered}/{len(pending)} 个")
+        return recovered
+
+    def go_to_next_page(self):
+        """点击下一页，没有下一页或翻页失败时返回False"""
+        try:
+            # 检查下一页按钮是否存在且可点击
+            next_button = self.driver.find_element(
+                By.XPATH,
+                "//li[contains(@class, 'PGT_next') and not(contains(@class, 'PGT_disabled'))]"
+            )
+            current = self.current_page()
+            # 使用JavaScript滚动到下一页按钮
+            self.driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
+            next_button.click()
+            # 等分页器切换到下一页，代替固定等待
+            WebDriverWait(self.driver, 10).until(lambda d: self.current_page() != current)
+            return True
         except Exception as e:
-            print(f"重命名文件时出错: {str(e)}")
+            return False
             
+    def has_next_page(self):
+        """分页器上是否还有下一页"""
+        try:
+            return self.extract_page()['pager']['has_next']
+        except Exception:
+            return True
+
     def process_all_products(self):
-        """处理所有商品的条码"""
+        """
+        处理所有商品的条码，上次运行被中断时从第一个未完成的页继续，最后重试失败的行
+        遍历到最后一页后在断点记录中标记本次运行完成
+        """
         
         try:
-            page = 1
+            if self.journal:
+                resume = self.journal.resume_page()
+                if resume > 1:
+                    print(f"从第 {resume} 页继续...")
+                    if not self.go_to_page(resume):
+                        print(f"跳转到第 {resume} 页失败，从第1页开始")
+                        self.go_to_page(1)
+            # 页码以分页器上实际显示的为准
+            page = self.current_page() or 1
+            completed = False
             while True:
                 print(f"\n处理第 {page} 页...")
-                # 获取当前页面上所有包含"查看条码"按钮的行
-                rows = self.driver.find_elements(
-                    By.XPATH,
-                    "//td[.//a[.//span[text()='查看条码']]]/.."
-                )
-                print(f"当前页找到 {len(rows)} 个商品")
-                
-                if not rows:
+                if not self.process_current_page(page):
                     print("没有找到更多商品，处理完成")
+                    completed = True
                     break
                 
-                # 处理当前页的所有商品
-                for i, row in enumerate(rows, 1):
-                    print(f"\n处理第 {i} 个商品...")
-                    success = self.get_barcode(row)
-                    time.sleep(1)  # 避免操作太快
-                
                 # 检查是否有下一页
-                try:
-                    # 检查下一页按钮是否存在且可点击
-                    next_button = self.driver.find_element(
-                        By.XPATH,
-                        "//li[contains(@class, 'PGT_next') and not(contains(@class, 'PGT_disabled'))]"
-                    )
-                    # 使用JavaScript滚动到下一页按钮
-                    self.driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
-                    time.sleep(1)  # 等待滚动完成
-                    next_button.click()
-                    print(f"已切换到第 {page + 1} 页")
-                    page += 1
-                    time.sleep(2)  # 等待页面加载
-                except Exception as e:
-                    print("没有下一页或翻页失败，处理完成")
+                if not self.go_to_next_page():
+                    completed = not self.has_next_page()
+                    print("没有下一页，处理完成" if completed else "翻页失败，停止")
                     break
+                page = self.current_page() or page + 1
+                print(f"已切换到第 {page} 页")
+            
+            self.retry_failed()
+            if completed and self.journal:
+                self.journal.mark_run_complete()
                 
         except Exception as e:
-            print(f"处理商品列表时出错: {str(e)}") 
\ No newline at end of file
+            print(f"处理商品列表时出错: {str(e)}")
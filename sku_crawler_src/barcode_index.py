@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import fitz  # PyMuPDF
+
+BARCODE_FILE_PATTERN = re.compile(r'^sku_(\d+)_(.*)\.pdf$')
+# 文件名中的下载时间和同一秒内的序号，例如 20241230_204741_2
+SAVED_AT_PATTERN = re.compile(r'^(\d{8}_\d{6})(?:_(\d+))?$')
+
+
+def saved_order(name):
+    """条码文件的先后顺序：按下载时间，同一秒内再按序号（_2在_10之前），无法解析时按文件名"""
+    rest = BARCODE_FILE_PATTERN.match(name).group(2)
+    match = SAVED_AT_PATTERN.match(rest)
+    if match:
+        return match.group(1), int(match.group(2) or 0), name
+    return rest, 0, name
+
+
+def content_hash(path):
+    """
+    计算条码PDF的内容哈希
+    页面生成的PDF每次都带不同的创建时间，文件字节不同但内容相同，
+    因此只对页面尺寸和绘制指令做哈希；无法解析时退回到文件字节
+    """
+    digest = hashlib.sha256()
+    try:
+        with fitz.open(path) as doc:
+            for page in doc:
+                digest.update(repr(tuple(page.rect)).encode())
+                digest.update(page.read_contents())
+    except Exception:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class BarcodeIndex:
+    """
+    条码目录的内容索引：SKU -> 最新的条码文件及其内容哈希
+    下载后登记新文件，内容与已有文件相同时删除新文件；
+    生成标签时记录所用条码的哈希，条码没有变化就不再重新生成
+    add和mark_label只修改内存中的索引，由调用方在批量处理结束后调用save；
+    索引可以随时通过refresh从目录重建
+    """
+
+    def __init__(self, barcode_dir="barcodes", index_file=None):
+        """
+        :param barcode_dir: 条码PDF目录
+        :param index_file: 索引文件路径，默认放在条码目录下
+        """
+        self.barcode_dir = barcode_dir
+        self.index_file = index_file or os.path.join(barcode_dir, ".index.json")
+        self.lock = threading.RLock()
+        # 文件名 -> {"sku", "hash", "size", "mtime"}，文件未变化时不重复计算哈希
+        self.files = {}
+        # SKU -> {"path", "hash"}
+        self.skus = {}
+        # SKU -> {"path", "hash", "mode"}，生成标签时使用的条码哈希和生成模式
+        self.labels = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取条码索引失败，将重新建立: {str(e)}")
+            return
+        self.files = data.get('files', {})
+        self.skus = data.get('skus', {})
+        self.labels = data.get('labels', {})
+
+    def save(self):
+        """先写临时文件再改名"""
+        with self.lock:
+            directory = os.path.dirname(self.index_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_file = f"{self.index_file}.part"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.files, 'skus': self.skus, 'labels': self.labels}, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+
+    def _file_entry(self, name):
+        """返回文件的索引项，文件大小或修改时间变化时重新计算哈希"""
+        path = os.path.join(self.barcode_dir, name)
+        stat = os.stat(path)
+        entry = self.files.get(name)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry
+        entry = {
+            'sku': BARCODE_FILE_PATTERN.match(name).group(1),
+            'hash': content_hash(path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime
+        }
+        self.files[name] = entry
+        return entry
+
+    def refresh(self, collapse=True):
+        """
+        扫描条码目录，重建SKU到最新条码的映射
+        文件名中SKU为空的文件（如sku__20241230_204741.pdf）不纳入索引
+        :param collapse: 是否删除与保留文件内容相同的重复文件
+        :return: 删除的重复文件数
+        """
+        removed = 0
+        with self.lock:
+            names = sorted(
+                (name for name in os.listdir(self.barcode_dir) if BARCODE_FILE_PATTERN.match(name)),
+                key=saved_order
+            ) if os.path.isdir(self.barcode_dir) else []
+            self.files = {name: entry for name, entry in self.files.items() if name in names}
+
+            by_sku = {}
+            for name in names:
+                try:
+                    entry = self._file_entry(name)
+                except OSError:
+                    continue
+                by_sku.setdefault(entry['sku'], []).append(name)
+
+            self.skus = {}
+            for sku, sku_names in by_sku.items():
+                # 按下载时间和序号排序后最后一个即最新
+                latest = sku_names[-1]
+                latest_hash = self.files[latest]['hash']
+                self.skus[sku] = {'path': os.path.join(self.barcode_dir, latest), 'hash': latest_hash}
+                if collapse:
+                    for name in sku_names[:-1]:
+                        if self.files[name]['hash'] == latest_hash:
+                            os.remove(os.path.join(self.barcode_dir, name))
+                            del self.files[name]
+                            removed += 1
+            self.save()
+
+        if removed:
+            print(f"已删除 {removed} 个重复的条码文件")
+        return removed
+
+    def add(self, sku, path):
+        """
+        登记新保存的条码文件
+        内容与该SKU当前的条码相同时删除新文件，返回已有文件的路径
+        :return: 该SKU当前条码文件的路径
+        """
+        name = os.path.basename(path)
+        if not sku or not BARCODE_FILE_PATTERN.match(name):
+            return path
+        with self.lock:
+            entry = self._file_entry(name)
+            current = self.skus.get(sku)
+            if current and current['hash'] == entry['hash'] and current['path'] != path \
+                    and os.path.exists(current['path']):
+                os.remove(path)
+                del self.files[name]
+                print(f"SKU {sku} 的条码内容没有变化，保留 {current['path']}")
+                return current['path']
+            self.skus[sku] = {'path': path, 'hash': entry['hash']}
+        return path
+
+    def lookup(self, sku):
+        """返回SKU当前条码文件的路径，不存在时返回None"""
+        entry = self.skus.get(sku)
+        return entry['path'] if entry else None
+
+    def items(self):
+        """[(SKU, 条码路径), ...]，按SKU排序"""
+        return [(sku, entry['path']) for sku, entry in sorted(self.skus.items())]
+
+    def label_current(self, sku, mode="raster"):
+        """该SKU的标签是否已经由当前条码、以指定模式（raster/vector）生成过"""
+        label = self.labels.get(sku)
+        barcode = self.skus.get(sku)
+        # 没有记录模式的旧索引项都是栅格模式生成的
+        return bool(label and barcode and label['hash'] == barcode['hash']
+                    and label.get('mode', 'raster') == mode and os.path.exists(label['path']))
+
+    def mark_label(self, sku, label_path, mode="raster"):
+        """记录该SKU的标签由当前条码以指定模式生成"""
+        with self.lock:
+            barcode = self.skus.get(sku)
+            if barcode:
+                self.labels[sku] = {'path': label_path, 'hash': barcode['hash'], 'mode': mode}
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+# 条码行里显示的SKU ID，例如 "SKU ID：6957499975"
+ROW_SKU_PATTERN = re.compile(r'SKU\s*(?:ID)?\s*[:：]?\s*(\d{6,})')
+BARCODE_FILE_PATTERN = re.compile(r'^sku_(\d+)_.*\.pdf$')
+
+
+def verify_pdf(path):
+    """检查文件是完整的PDF：以%PDF开头并以%%EOF结尾"""
+    try:
+        size = os.path.getsize(path)
+        if size < 16:
+            return False
+        with open(path, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                return False
+            f.seek(max(0, size - 1024))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+
+def sku_from_row_text(text):
+    """从条码列表行的文本中取出SKU ID，找不到返回空字符串"""
+    match = ROW_SKU_PATTERN.search(text or '')
+    return match.group(1) if match else ''
+
+
+class BarcodeJournal:
+    """
+    条码下载的断点记录，只追加写入的JSON Lines文件
+    记录已完成的SKU、已处理完的页码和失败的行。重新运行时读取记录，
+    跳过已有完整PDF的SKU，失败的行在最后统一重试。
+    一次完整遍历结束后写入complete记录，清空页码和失败行：页码续传只用于被中断的那次运行，
+    下次运行从第1页重新遍历，已下载的SKU仍然按SKU跳过
+    """
+
+    def __init__(self, journal_file=os.path.join('barcodes', '.journal.jsonl'), barcode_dir='barcodes'):
+        """
+        :param journal_file: 记录文件路径
+        :param barcode_dir: 条码PDF目录，目录中已有的完整PDF也视为已完成
+        """
+        self.journal_file = journal_file
+        self.barcode_dir = barcode_dir
+        self.lock = threading.Lock()
+        self.done = {}
+        self.finished_pages = set()
+        self.failed = {}
+        self.load()
+        directory = os.path.dirname(journal_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.file = open(journal_file, 'a', encoding='utf-8')
+
+    def load(self):
+        """回放记录文件，恢复上次运行的进度"""
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能不完整
+                        continue
+                    self._apply(entry)
+
+        # 没有记录的旧文件：目录中已有的完整PDF同样算作已完成
+        if os.path.isdir(self.barcode_dir):
+            for name in sorted(os.listdir(self.barcode_dir)):
+                match = BARCODE_FILE_PATTERN.match(name)
+                if match and match.group(1) not in self.done:
+                    path = os.path.join(self.barcode_dir, name)
+                    if verify_pdf(path):
+                        self.done[match.group(1)] = path
+
+        if self.done or self.finished_pages:
+            print(f"读取断点记录: 已完成 {len(self.done)} 个SKU，{len(self.finished_pages)} 页，"
+                  f"待重试 {len(self.failed)} 个")
+
+    def _apply(self, entry):
+        kind = entry.get('type')
+        if kind == 'sku':
+            self.done[entry['sku']] = entry.get('path')
+            self.failed.pop(self._failed_key(entry.get('page'), entry['sku'], None), None)
+            if entry.get('row') is not None:
+                self.failed.pop(self._failed_key(entry.get('page'), None, entry['row']), None)
+        elif kind == 'page':
+            self.finished_pages.add(entry['page'])
+        elif kind == 'complete':
+            self.finished_pages.clear()
+            self.failed.clear()
+        elif kind == 'failed':
+            key = self._failed_key(entry.get('page'), entry.get('sku'), entry.get('row'))
+            self.failed[key] = entry
+
+    @staticmethod
+    def _failed_key(page, sku, row):
+        return (page, sku) if sku else (page, f"row{row}")
+
+    def _append(self, entry):
+        entry['ts'] = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            self._apply(entry)
+            self.file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.file.flush()
+
+    def is_done(self, sku):
+        """SKU是否已有校验通过的PDF，记录的文件已被删除（如重复文件被合并）时查找该SKU的其他文件"""
+        if not sku or sku not in self.done:
+            return False
+        path = self.done.get(sku)
+        if path and verify_pdf(path):
+            return True
+        path = self.find_verified(sku)
+        if path:
+            self.done[sku] = path
+        return bool(path)
+
+    def find_verified(self, sku):
+        """条码目录中该SKU任一校验通过的PDF，找不到返回None"""
+        if not os.path.isdir(self.barcode_dir):
+            return None
+        for name in sorted(os.listdir(self.barcode_dir), reverse=True):
+            match = BARCODE_FILE_PATTERN.match(name)
+            if match and match.group(1) == sku and verify_pdf(os.path.join(self.barcode_dir, name)):
+                return os.path.join(self.barcode_dir, name)
+        return None
+
+    def mark_done(self, sku, path, page=None, row=None):
+        self._append({'type': 'sku', 'sku': sku, 'path': path, 'page': page, 'row': row})
+
+    def mark_failed(self, page, row, sku=''):
+        self._append({'type': 'failed', 'page': page, 'row': row, 'sku': sku})
+
+    def mark_page(self, page):
+        self._append({'type': 'page', 'page': page})
+
+    def mark_run_complete(self):
+        """整个列表已遍历完，之后的运行不再按页码续传"""
+        self._append({'type': 'complete'})
+
+    def page_done(self, page):
+        return page in self.finished_pages
+
+    def resume_page(self):
+        """第一个没有处理完的页码"""
+        page = 1
+        while page in self.finished_pages:
+            page += 1
+        return page
+
+    def pending_retries(self):
+        """
+        还没有重试成功的失败行，按页码排序
+        :return: [(页码, 行号, SKU), ...]
+        """
+        with self.lock:
+            entries = [e for e in self.failed.values() if not (e.get('sku') and e['sku'] in self.done)]
+        return sorted(((e.get('page') or 0, e.get('row') or 0, e.get('sku') or '') for e in entries))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
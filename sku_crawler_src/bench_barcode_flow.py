@@ -0,0 +1,63 @@
+import argparse
+import os
+import tempfile
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from barcode_handler import BarcodeHandler
+from browser_handler import BrowserHandler
+from label_page_replay import LabelPageServer
+from navigation_handler import NavigationHandler
+from tracing import tracer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="浏览器条码流程吞吐量基准测试（使用本地商品条码页面替身）")
+    parser.add_argument("--rows", type=int, default=60, help="商品行总数")
+    parser.add_argument("--page-size", type=int, default=20, help="每页行数")
+    parser.add_argument("--page-latency", type=float, default=0.3, help="页面和翻页的渲染延迟（秒）")
+    parser.add_argument("--modal-latency", type=float, default=0.2, help="条码弹窗出现的延迟（秒）")
+    parser.add_argument("--pdf-latency", type=float, default=0.1, help="生成PDF的延迟（秒）")
+    parser.add_argument("--translate-every", type=int, default=0, help="每隔多少行出现一次翻译弹窗，0表示不出现")
+    parser.add_argument("--no-popups", action="store_true", help="不弹出考试弹窗和消息悬浮框")
+    parser.add_argument("--no-suppress", action="store_true", help="不注入弹窗屏蔽脚本，改用导航时的一次性移除")
+    parser.add_argument("--headless", action="store_true", help="使用无头模式")
+    parser.add_argument("--fixture-dir", default="fixtures/pagequery", help="录制的pageQuery数据目录")
+    args = parser.parse_args()
+
+    server = LabelPageServer(
+        rows=args.rows,
+        page_size=args.page_size,
+        page_latency=args.page_latency,
+        modal_latency=args.modal_latency,
+        pdf_latency=args.pdf_latency,
+        translate_every=args.translate_every,
+        exam_popup=not args.no_popups,
+        message_popover=not args.no_popups,
+        fixture_dir=args.fixture_dir
+    )
+    output_dir = tempfile.mkdtemp(prefix="bench_barcodes_")
+
+    with server:
+        print(f"商品条码页面替身: {server.base_url}，共 {args.rows} 行，条码保存到 {output_dir}")
+        driver, wait = BrowserHandler.init_browser(headless=args.headless, suppress_popups=not args.no_suppress)
+        try:
+            start = time.perf_counter()
+            if not NavigationHandler(driver, wait, base_url=server.base_url).navigate_to_product_label():
+                print("导航失败")
+                return
+            navigated = time.perf_counter()
+
+            handler = BarcodeHandler(driver, WebDriverWait(driver, 8), output_dir=output_dir)
+            handler.process_all_products()
+            elapsed = time.perf_counter() - navigated
+        finally:
+            driver.quit()
+
+    saved = len([name for name in os.listdir(output_dir) if name.endswith('.pdf')])
+    print(f"\n导航耗时 {navigated - start:.2f} 秒，条码处理耗时 {elapsed:.2f} 秒")
+    print(f"保存 {saved}/{args.rows} 个条码，{saved / elapsed * 60:.1f} SKU/分钟")
+    tracer.print_summary()
+
+
+if __name__ == "__main__":
+    main()
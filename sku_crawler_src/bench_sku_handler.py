@@ -0,0 +1,64 @@
+import argparse
+import math
+import time
+from http_transport import create_session
+from pagequery_replay import ReplayServer
+from rate_limiter import AdaptiveRateLimiter
+from sku_handler import SkuHandler
+
+
+def run_once(base_url, max_workers, args):
+    """对回放服务器完整同步一次，返回耗时、页数、获取到的SKU数量和失败页数"""
+    session = create_session(pool_size=max(4, max_workers))
+    # 每次使用独立的限速器，避免上一轮调整后的速率影响本轮结果
+    limiter = AdaptiveRateLimiter(rate=args.rate, max_rate=args.max_rate)
+    handler = SkuHandler(session, log_mode=args.log_mode, limiter=limiter, base_url=base_url)
+
+    start = time.perf_counter()
+    try:
+        sku_ids = handler.fetch_all_skus(max_workers=max_workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        handler.close()
+    # 按handler实际使用的每页数量计算页数
+    pages = max(1, math.ceil(args.catalogue_size / handler.page_size))
+    return elapsed, pages, len(sku_ids), len(handler.failed_pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkuHandler翻页吞吐量基准测试（使用本地回放服务器）")
+    parser.add_argument("--fixture-dir", default="fixtures/pagequery", help="录制数据目录")
+    parser.add_argument("--catalogue-size", type=int, default=2000, help="模拟的SKU总数")
+    parser.add_argument("--latency", type=float, default=0.2, help="每个请求的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回429的概率")
+    parser.add_argument("--workers", default="1,4,8", help="要测试的并发数，逗号分隔，1为逐页获取")
+    parser.add_argument("--rate", type=float, default=2.0, help="限速器初始速率（请求/秒）")
+    parser.add_argument("--max-rate", type=float, default=20.0, help="限速器速率上限（请求/秒）")
+    parser.add_argument("--log-mode", default="compact", choices=["verbose", "compact"], help="SkuHandler日志模式")
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        fixture_dir=args.fixture_dir,
+        catalogue_size=args.catalogue_size,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate
+    )
+
+    results = []
+    with server:
+        print(f"回放服务器: {server.base_url}，SKU总数 {server.catalogue_size}")
+        for max_workers in [int(w) for w in args.workers.split(',')]:
+            name = "sequential" if max_workers == 1 else f"concurrent-{max_workers}"
+            server.request_count = 0
+            elapsed, pages, sku_count, failed = run_once(server.base_url, max_workers, args)
+            results.append((name, elapsed, pages / elapsed, sku_count, server.request_count, failed))
+
+    print(f"\n{'模式':<16}{'总耗时(s)':>12}{'页/秒':>10}{'SKU数':>10}{'请求数':>10}{'失败页':>8}")
+    for name, elapsed, pages_per_sec, sku_count, requests_made, failed in results:
+        print(f"{name:<16}{elapsed:>12.2f}{pages_per_sec:>10.2f}{sku_count:>10}{requests_made:>10}{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
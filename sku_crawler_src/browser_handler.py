@@ -1,39 +1,190 @@
+import os
+import re
+import json
+import shutil
+import subprocess
 from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+# 条码流程用不到的资源：图片、音视频、网页字体和第三方统计脚本
+# 条码PDF由jsPDF生成并内嵌SourceHanSansCN字体，生成时可能需要加载ttf/otf，因此不拦截这两类字体
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico", "*.bmp",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg",
+    "*.woff", "*.woff2", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*hotjar.com*", "*clarity.ms*", "*facebook.net*", "*sentry.io*",
+]
+
+# 统计页面加载耗时和传输字节数（跨域资源未返回Timing-Allow-Origin时transferSize为0，结果偏小）
+PAGE_LOAD_METRICS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? nav.transferSize : 0;
+resources.forEach(function(r) { bytes += r.transferSize || 0; });
+return {
+    load_ms: nav ? Math.round(nav.loadEventEnd || nav.duration) : null,
+    dom_ready_ms: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+    bytes: bytes,
+    requests: resources.length + (nav ? 1 : 0)
+};
+"""
+
+# 卖家中心的考试弹窗和消息悬浮框会在页面加载后的任意时刻出现并挡住点击。
+# 在每个新文档加载前注册：先插入隐藏样式，再用MutationObserver在弹窗挂载的瞬间把它隐藏。
+# 只处理考试弹窗（含exam-detail_内容的MDL弹窗）和PT_/PP_悬浮框，条码弹窗和翻译弹窗不受影响。
+POPUP_SUPPRESSOR_JS = """
+(function() {
+    if (window.__popupSuppressor) return;
+    window.__popupSuppressor = true;
+
+    var EXAM_SELECTOR = '[class*="exam-detail_"]';
+    var POPOVER_SELECTOR = '[class*="PT_outerWrapper"], [class*="PP_outerWrapper"], [class*="PT_popover"], [class*="PP_popover"]';
+    var MODAL_SELECTOR = '[class*="MDL_outerWrapper"], [data-testid="beast-core-modal"], [data-testid="beast-core-modal-inner"]';
+    var HIDDEN = ' { display: none !important; pointer-events: none !important; }\n';
+    // :has单独成一条规则，浏览器不支持时不影响前一条
+    var CSS = EXAM_SELECTOR + ', ' + POPOVER_SELECTOR + HIDDEN
+        + '[data-testid="beast-core-portal"]:has(' + EXAM_SELECTOR + ')' + HIDDEN;
+
+    function hide(el) {
+        el.style.setProperty('display', 'none', 'important');
+        el.style.setProperty('pointer-events', 'none', 'important');
+    }
+
+    function suppress(root) {
+        if (!root.querySelectorAll) return;
+        var exams = root.matches && root.matches(EXAM_SELECTOR) ? [root] : [];
+        root.querySelectorAll(EXAM_SELECTOR).forEach(function(el) { exams.push(el); });
+        exams.forEach(function(el) {
+            // 连同遮罩层一起隐藏，并恢复被弹窗锁住的页面滚动
+            hide(el.closest('[data-testid="beast-core-portal"]') || el.closest(MODAL_SELECTOR) || el);
+            if (document.body) document.body.style.overflow = '';
+        });
+        if (root.matches && root.matches(POPOVER_SELECTOR)) hide(root);
+        root.querySelectorAll(POPOVER_SELECTOR).forEach(hide);
+    }
+
+    function start() {
+        var style = document.createElement('style');
+        style.textContent = CSS;
+        (document.head || document.documentElement).appendChild(style);
+
+        new MutationObserver(function(mutations) {
+            mutations.forEach(function(m) {
+                m.addedNodes.forEach(function(node) {
+                    if (node.nodeType === 1) suppress(node);
+                });
+            });
+        }).observe(document.documentElement, { childList: true, subtree: true });
+        suppress(document.documentElement);
+    }
+
+    if (document.documentElement) {
+        start();
+    } else {
+        document.addEventListener('readystatechange', start, { once: true });
+    }
+})();
+"""
+
+# chromedriver路径和版本的本地缓存，Chrome版本不变时不再联网检查
+DRIVER_CACHE_FILE = ".chromedriver.json"
+CHROME_BINARIES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+VERSION_PATTERN = re.compile(r'(\d+\.\d+\.\d+\.\d+)')
+
+
+def read_version(binary):
+    """执行 binary --version 并取出版本号，失败返回None"""
+    try:
+        output = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_PATTERN.search(output or '')
+    return match.group(1) if match else None
+
+
+def detect_chrome_version():
+    """本机Chrome的版本号，找不到Chrome时返回None"""
+    for binary in CHROME_BINARIES:
+        path = shutil.which(binary) or (binary if os.path.isfile(binary) else None)
+        if path:
+            version = read_version(path)
+            if version:
+                return version
+    return None
+
+
+def resolve_chromedriver(cache_file=DRIVER_CACHE_FILE, refresh=False):
+    """
+    返回与本机Chrome匹配的chromedriver路径
+    缓存中的Chrome版本与当前一致且文件仍存在时直接使用缓存，否则通过ChromeDriverManager重新获取
+    :param cache_file: 缓存文件路径
+    :param refresh: 忽略缓存，强制重新获取
+    """
+    chrome_version = detect_chrome_version()
+    cache = {}
+    if not refresh and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    driver_path = cache.get('driver_path')
+    # 检测不到Chrome版本时也先使用缓存，版本不匹配会在启动时失败并触发刷新
+    if driver_path and os.path.exists(driver_path) and cache.get('chrome_version') == chrome_version:
+        return driver_path
+
+    print(f"正在获取chromedriver（Chrome版本: {chrome_version or '未知'}）...")
+    driver_path = ChromeDriverManager().install()
+    cache = {
+        'chrome_version': chrome_version,
+        'driver_path': driver_path,
+        'driver_version': read_version(driver_path)
+    }
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    print(f"chromedriver {cache['driver_version'] or ''} 已缓存: {driver_path}")
+    return driver_path
+
+
 class BrowserHandler:
     @staticmethod
-    def init_browser():
-        """初始化Chrome浏览器"""
+    def init_browser(headless=False, block_resources=False, user_data_dir=None, suppress_popups=True,
+                     debugger_address=None, page_load_strategy="normal"):
+        """
+        初始化Chrome浏览器
+        :param headless: 是否使用无头模式
+        :param block_resources: 是否拦截图片、音视频、网页字体和第三方统计脚本
+        :param user_data_dir: Chrome用户数据目录，指定后cookies、localStorage和缓存在多次运行间保留
+        :param suppress_popups: 是否在每个页面注入弹窗屏蔽脚本
+        :param debugger_address: 连接已在运行的Chrome（如 "127.0.0.1:9222"，该Chrome需以
+            --remote-debugging-port=9222 启动），连接时忽略headless和user_data_dir
+        :param page_load_strategy: 页面加载策略，normal等到所有资源加载完，eager在DOM就绪后即返回，
+            之后由调用方显式等待需要的元素
+        """
         try:
             print("正在初始化Chrome浏览器...")
             options = Options()
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-infobars')
-            options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            options.add_experimental_option('useAutomationExtension', False)
-            
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
-            
-            # 设置webdriver检测绕过
-            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                'source': '''
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    })
-                '''
-            })
+            options.page_load_strategy = page_load_strategy
+            if debugger_address:
+                # 连接已打开并登录的浏览器，省去启动时间；此时不能再设置启动参数
+                print(f"连接已运行的Chrome: {debugger_address}")
+                options.add_experimental_option('debuggerAddress', debugger_address)
+            else:
+                BrowserHandler.add_launch_options(options, headless, user_data_dir)
             
-            # 设置用户代理
-            driver.execute_cdp_cmd('Network.setUserAgentOverride', {
-                "userAgent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-            })
+            driver = BrowserHandler.start_driver(options)
+            BrowserHandler.setup_target(driver, suppress_popups=suppress_popups, block_resources=block_resources)
+            if block_resources:
+                print(f"已开启资源拦截，共 {len(BLOCKED_URL_PATTERNS)} 条规则")
             
             wait = WebDriverWait(driver, 8)
             print("Chrome浏览器初始化成功")
@@ -41,4 +192,105 @@ class BrowserHandler:
             
         except Exception as e:
             print(f"初始化Chrome浏览器失败: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def setup_target(driver, suppress_popups=True, block_resources=False):
+        """
+        对driver当前的标签页做CDP设置：注入脚本、资源拦截和用户代理
+        这些设置只作用于当前标签页，之后新开的标签页切换过去后需要再调用一次
+        """
+        # 设置webdriver检测绕过
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': '''
+                Object.defineProperty(navigator, 'webdriver', {
+                    get: () => undefined
+                })
+            '''
+        })
+        
+        # 持续屏蔽考试弹窗和消息悬浮框
+        if suppress_popups:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': POPUP_SUPPRESSOR_JS})
+        
+        # 放大资源计时缓冲区，便于统计整页传输量
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': 'performance.setResourceTimingBufferSize(5000);'
+        })
+        
+        if block_resources:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        
+        # 设置用户代理
+        driver.execute_cdp_cmd('Network.setUserAgentOverride', {
+            "userAgent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+        })
+
+    @staticmethod
+    def add_launch_options(options, headless=False, user_data_dir=None):
+        """启动新浏览器时使用的参数"""
+        if user_data_dir:
+            options.add_argument(f'--user-data-dir={os.path.abspath(user_data_dir)}')
+        if headless:
+            options.add_argument('--headless=new')
+            options.add_argument('--window-size=1920,1080')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_argument('--disable-infobars')
+        # 多标签页并发处理时，避免后台标签页的定时器和渲染被降频
+        options.add_argument('--disable-background-timer-throttling')
+        options.add_argument('--disable-backgrounding-occluded-windows')
+        options.add_argument('--disable-renderer-backgrounding')
+        options.add_experimental_option('excludeSwitches', ['enable-automation'])
+        options.add_experimental_option('useAutomationExtension', False)
+
+    @staticmethod
+    def start_driver(options):
+        """使用缓存的chromedriver启动，Chrome升级导致版本不匹配时刷新缓存后重试一次"""
+        try:
+            return webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+        except SessionNotCreatedException as e:
+            print(f"chromedriver与Chrome版本不匹配，重新获取: {str(e).splitlines()[0]}")
+            return webdriver.Chrome(service=Service(resolve_chromedriver(refresh=True)), options=options)
+
+    @staticmethod
+    def measure_page_load(driver):
+        """
+        读取当前页面的加载耗时和传输字节数
+        :return: {'load_ms', 'dom_ready_ms', 'bytes', 'requests'}
+        """
+        try:
+            return driver.execute_script(PAGE_LOAD_METRICS_JS)
+        except Exception as e:
+            print(f"读取页面加载数据失败: {str(e)}")
+            return None
+
+    @staticmethod
+    def compare_blocking(url="https://seller.kuajingmaihuo.com/login", headless=True):
+        """
+        分别在拦截和不拦截资源的情况下打开同一页面，打印加载耗时和传输量
+        :param url: 要测试的页面，默认为无需登录的登录页
+        :param headless: 是否使用无头模式
+        """
+        results = {}
+        for block_resources in (False, True):
+            driver, _ = BrowserHandler.init_browser(headless=headless, block_resources=block_resources)
+            try:
+                driver.get(url)
+                results[block_resources] = BrowserHandler.measure_page_load(driver)
+            finally:
+                driver.quit()
+
+        print(f"\n{'模式':<10}{'加载耗时(ms)':>14}{'传输量(KB)':>14}{'请求数':>8}")
+        for block_resources, metrics in results.items():
+            if not metrics:
+                continue
+            name = "拦截" if block_resources else "不拦截"
+            print(f"{name:<10}{metrics['load_ms']:>14}{metrics['bytes'] / 1024:>14.1f}{metrics['requests']:>8}")
+        return results
+
+
+if __name__ == "__main__":
+    BrowserHandler.compare_blocking()
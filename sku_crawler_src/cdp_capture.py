@@ -0,0 +1,90 @@
+import os
+import base64
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# 条码PDF由页面中的jsPDF生成，下载前会通过URL.createObjectURL得到blob地址，
+# 没有对应的网络响应。这里在每个新文档加载前注入钩子，把PDF blob留在页面里，
+# 点击"保存条码"后直接读取其字节，不经过下载目录。
+PDF_CAPTURE_JS = """
+(function() {
+    if (window.__pdfCapture) return;
+    window.__pdfCapture = [];
+    var originalCreateObjectURL = URL.createObjectURL;
+    URL.createObjectURL = function(obj) {
+        try {
+            if (obj instanceof Blob && obj.type === 'application/pdf') {
+                window.__pdfCapture.push(obj);
+            }
+        } catch (e) {}
+        return originalCreateObjectURL.apply(this, arguments);
+    };
+})();
+"""
+
+READ_BLOB_JS = """
+var done = arguments[arguments.length - 1];
+var blob = window.__pdfCapture.shift();
+var reader = new FileReader();
+reader.onload = function() { done(reader.result.split(',')[1]); };
+reader.onerror = function() { done(null); };
+reader.readAsDataURL(blob);
+"""
+
+
+class PdfCapture:
+    """通过CDP注入脚本捕获页面生成的PDF，点击后直接拿到文件字节"""
+
+    def __init__(self, driver, block_downloads=True):
+        """
+        :param driver: selenium webdriver
+        :param block_downloads: 是否禁止浏览器把PDF另存到下载目录
+        """
+        self.driver = driver
+        self.block_downloads = block_downloads
+        self.installed = False
+
+    def install(self):
+        """注册钩子：对之后加载的页面自动生效，同时注入当前页面"""
+        self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': PDF_CAPTURE_JS})
+        self.driver.execute_script(PDF_CAPTURE_JS)
+        if self.block_downloads:
+            try:
+                self.driver.execute_cdp_cmd('Browser.setDownloadBehavior', {'behavior': 'deny'})
+            except Exception as e:
+                print(f"设置下载行为失败，PDF仍会保存到下载目录: {str(e)}")
+        self.installed = True
+        return self
+
+    def reset(self):
+        """点击前清空已捕获的PDF，保证下一次取到的是本次点击生成的文件"""
+        self.driver.execute_script(PDF_CAPTURE_JS + "window.__pdfCapture.length = 0;")
+
+    def wait_for_pdf(self, timeout=10, poll_frequency=0.05):
+        """
+        等待页面生成PDF并返回其字节
+        :param timeout: 最长等待秒数
+        :param poll_frequency: 检查间隔
+        :return: PDF字节，超时返回None
+        """
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=poll_frequency).until(
+                lambda d: d.execute_script("return window.__pdfCapture && window.__pdfCapture.length > 0;")
+            )
+        except TimeoutException:
+            return None
+
+        encoded = self.driver.execute_async_script(READ_BLOB_JS)
+        if not encoded:
+            return None
+        data = base64.b64decode(encoded)
+        return data if data.startswith(b'%PDF') else None
+
+
+def write_pdf(data, path):
+    """先写临时文件再改名，避免读取方看到写了一半的PDF"""
+    temp_path = f"{path}.part"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,102 @@
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx的HTTP/2支持依赖h2
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+
+# 只声明本地能解压的编码，避免服务端返回无法解码的br内容
+ACCEPT_ENCODING = "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"
+
+# 请求异常类型，重试逻辑据此判断是否属于网络层错误
+TRANSPORT_ERRORS = (requests.exceptions.RequestException,)
+if httpx is not None:
+    TRANSPORT_ERRORS += (httpx.TransportError,)
+
+
+class TimeoutSession(requests.Session):
+    """带默认超时的requests.Session，避免请求无限期挂起"""
+
+    def __init__(self, timeout=(5, 30)):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_size=16, http2=False, timeout=(5, 30)):
+    """
+    创建LoginHandler和SkuHandler共用的HTTP客户端
+    :param pool_size: 连接池大小，应不小于并发线程数
+    :param http2: 是否使用HTTP/2（需要安装httpx[http2]），并发请求复用同一个连接
+    :param timeout: 默认超时，(连接超时, 读取超时)秒
+    :return: requests.Session或httpx.Client，两者的request/post/cookies接口在本项目中用法一致
+    """
+    logger = logging.getLogger('sku_crawler')
+
+    if http2:
+        if httpx is not None and HAS_H2:
+            connect_timeout, read_timeout = timeout
+            client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                headers={"accept-encoding": ACCEPT_ENCODING},
+            )
+            logger.info("使用HTTP/2客户端")
+            return client
+        logger.warning("未安装httpx[http2]，回退到HTTP/1.1连接池")
+
+    session = TimeoutSession(timeout=timeout)
+    # 重试由rate_limiter.request_with_retry负责，这里不再重试
+    # pool_block=True：并发线程数超过连接池时排队等待空闲连接，而不是新建用完即丢的连接
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["accept-encoding"] = ACCEPT_ENCODING
+    session.headers["connection"] = "keep-alive"
+    return session
+
+
+def copy_browser_cookies(driver, session):
+    """
+    把浏览器中的cookies复制到HTTP客户端
+    :param driver: selenium webdriver
+    :param session: create_session返回的客户端
+    :return: 复制的cookie数量
+    """
+    cookies = driver.get_cookies()
+    for cookie in cookies:
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain', ''),
+            path=cookie.get('path', '/')
+        )
+    return len(cookies)
+
+
+def iter_cookies(session):
+    """遍历客户端中的Cookie对象，兼容requests和httpx"""
+    return iter(getattr(session.cookies, 'jar', session.cookies))
@@ -1,19 +1,222 @@
 from PIL import Image, ImageDraw, ImageFont
 import fitz  # PyMuPDF
 import os
-from datetime import datetime
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import re
-import tempfile
+import shutil
+import subprocess
+from barcode_index import BarcodeIndex
+from tracing import tracer, traced
+
+
+# SKU ID使用的粗体字体，按顺序查找：macOS的Arial，其次是Linux常见的DejaVu和Liberation
+FONT_CANDIDATES = [
+    "/System/Library/Fonts/Arial Bold.ttf",
+    "/Library/Fonts/Arial Bold.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+    "/System/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/liberation-sans/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+]
+
+# SKU区域的相对位置（按模板1314x1124像素量出）
+LEFT_MARGIN_RATIO = 30/1314    # 左边距占模板宽度的4%
+TOP_MARGIN_RATIO = 165/1124     # 上边距占模板高度的25%
+WIDTH_RATIO = 1250/1314          # SKU区域宽度占模板宽度的92%
+HEIGHT_RATIO = 435/1124          # SKU区域高度占模板高度的35%
+# SKU ID写在"Batch Code:"后面
+TEXT_X_RATIO = 0.28  # 左边距28%
+TEXT_Y_RATIO = 0.61  # 距离顶部61.5%
+FONT_HEIGHT_RATIO = 52/1124  # 栅格模板中52像素字号占模板高度的比例
+
+
+def find_font_path():
+    """查找可用的粗体字体文件，都不存在时通过fc-match查询，找不到返回None"""
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    if shutil.which("fc-match"):
+        for pattern in ("Arial:bold", "sans-serif:bold"):
+            try:
+                path = subprocess.run(["fc-match", "-f", "%{file}", pattern],
+                                      capture_output=True, text=True, timeout=5).stdout.strip()
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if path and os.path.exists(path):
+                return path
+    return None
+
+
+class PreparedTemplate:
+    """
+    预先准备好的模板：解码后的模板图片、SKU ID字体和各区域位置
+    每个标签从模板图片的副本开始，不再重复打开图片、查找字体和计算位置
+    """
+
+    def __init__(self, template_path, font_size=52):
+        image = Image.open(template_path)
+        self.image = image.convert('RGB') if image.mode != 'RGB' else image
+        self.image.load()
+        width, height = self.image.size
+        # (左, 上, 右, 下)
+        self.sku_box = (
+            int(width * LEFT_MARGIN_RATIO),
+            int(height * TOP_MARGIN_RATIO),
+            int(width * WIDTH_RATIO),
+            int(height * HEIGHT_RATIO)
+        )
+        self.text_position = (int(width * TEXT_X_RATIO), int(height * TEXT_Y_RATIO))
+        self.font_path = find_font_path()
+        if self.font_path:
+            self.font = ImageFont.truetype(self.font_path, font_size)
+        else:
+            print("未找到粗体字体，使用默认字体")
+            self.font = ImageFont.load_default()
+
+    def new_canvas(self):
+        """返回模板图片的副本"""
+        return self.image.copy()
+
+    def place_barcode(self, canvas, sku_image):
+        """把条码图片按比例缩放到SKU区域并居中粘贴"""
+        target_width = self.sku_box[2] - self.sku_box[0]
+        target_height = self.sku_box[3] - self.sku_box[1]
+        ratio = min(target_width / sku_image.width, target_height / sku_image.height)
+        new_width = int(sku_image.width * ratio)
+        new_height = int(sku_image.height * ratio)
+        sku_image = sku_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        paste_x = self.sku_box[0] + (target_width - new_width) // 2
+        paste_y = self.sku_box[1] + (target_height - new_height) // 2
+        canvas.paste(sku_image, (paste_x, paste_y))
+
+    def draw_sku_id(self, canvas, sku_id):
+        """写入SKU ID，用1像素描边实现加粗"""
+        ImageDraw.Draw(canvas).text(
+            self.text_position, f"{sku_id}", font=self.font,
+            fill='black', stroke_width=1, stroke_fill='black'
+        )
+
+
+def save_compressed(doc, output_path):
+    """
+    压缩并保存生成的PDF，同时去掉不再被引用的对象
+    条码PDF内嵌了两份未压缩的字体（约540KB），压缩是主要耗时，
+    中等压缩级别比默认级别快一倍，文件大小几乎不变；旧版PyMuPDF不支持该参数
+    """
+    try:
+        doc.save(output_path, garbage=1, deflate=True, compression_effort=50)
+    except TypeError:
+        doc.save(output_path, garbage=1, deflate=True)
+
+
+class VectorTemplate:
+    """
+    矢量标签模板：把条码PDF页面直接放到template.pdf上，SKU ID写成PDF文本
+    不经过栅格化，生成更快、文件更小，打印更清晰
+    """
+
+    FONT_NAME = "hebo"  # PDF内置的Helvetica-Bold，无需嵌入字体
+
+    def __init__(self, template_pdf_path):
+        self.doc = fitz.open(template_pdf_path)
+        self.rect = self.doc[0].rect
+        width, height = self.rect.width, self.rect.height
+        # 按模板实际高度换算，与栅格模板中的字号等高
+        self.font_size = height * FONT_HEIGHT_RATIO
+        self.sku_rect = fitz.Rect(
+            width * LEFT_MARGIN_RATIO,
+            height * TOP_MARGIN_RATIO,
+            width * WIDTH_RATIO,
+            height * HEIGHT_RATIO
+        )
+        self.text_point = fitz.Point(width * TEXT_X_RATIO, self.find_batch_code_baseline())
+
+    def find_batch_code_baseline(self):
+        """SKU ID与模板中"Batch Code:"写在同一基线上，找不到时按栅格模板的位置估算"""
+        for block in self.doc[0].get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    if span["text"].strip().startswith("Batch Code"):
+                        return span["origin"][1]
+        return self.rect.height * TEXT_Y_RATIO + self.font_size * 0.8
+
+    def place(self, page, rect, barcode, sku_id):
+        """
+        在page的rect区域画一个标签，rect与模板宽高比不同时保持比例、居中
+        同一输出文档中模板只嵌入一次，之后每次都引用同一个XObject
+        :param barcode: 已打开的条码PDF文档
+        """
+        scale = min(rect.width / self.rect.width, rect.height / self.rect.height)
+        origin = fitz.Point(
+            rect.x0 + (rect.width - self.rect.width * scale) / 2,
+            rect.y0 + (rect.height - self.rect.height * scale) / 2
+        )
+        matrix = fitz.Matrix(scale, scale) * fitz.Matrix(1, 0, 0, 1, origin.x, origin.y)
+        page.show_pdf_page(self.rect * matrix, self.doc, 0)
+        # 条码页面保持宽高比，居中放入SKU区域
+        page.show_pdf_page(self.sku_rect * matrix, barcode, 0)
+        page.insert_text(self.text_point * matrix, f"{sku_id}", fontname=self.FONT_NAME,
+                         fontsize=self.font_size * scale, color=(0, 0, 0))
+
+    def render(self, barcode_pdf_path, sku_id, output_path):
+        """生成一个矢量标签PDF"""
+        out = fitz.open()
+        try:
+            page = out.new_page(width=self.rect.width, height=self.rect.height)
+            with fitz.open(barcode_pdf_path) as barcode:
+                self.place(page, page.rect, barcode, sku_id)
+            save_compressed(out, output_path)
+        finally:
+            out.close()
+
+
+def label_path_for(barcode_pdf_path, output_dir):
+    """由条码文件名得到标签文件名：sku_<SKU>_<时间>.pdf -> label_<SKU>_<时间>.pdf，同一条码总是生成同名标签"""
+    name = os.path.basename(barcode_pdf_path)
+    if name.startswith("sku_"):
+        name = name[len("sku_"):]
+    return os.path.join(output_dir, f"label_{name}")
+
+
+# 进程池中每个工作进程各自持有一个LabelGenerator，模板只在进程启动时加载一次
+_worker_generator = None
+
+
+def _init_worker(barcodes_dir, output_dir, mode):
+    global _worker_generator
+    _worker_generator = LabelGenerator(barcodes_dir, output_dir, mode)
+    _worker_generator.load_template()
+
+
+def _render_in_worker(sku, barcode_pdf_path):
+    """在工作进程中生成一个标签，返回(SKU, 标签路径或None, 错误信息, 耗时, 进程号)"""
+    start = time.perf_counter()
+    try:
+        output_path = _worker_generator.generate_label(sku, barcode_pdf_path)
+        error = None if output_path else "生成标签失败"
+    except Exception as e:
+        output_path, error = None, str(e)
+    return sku, output_path or None, error, time.perf_counter() - start, os.getpid()
 
 class LabelGenerator:
-    def __init__(self):
-        self.barcodes_dir = "barcodes"
-        self.output_dir = "labels"
-        self.temp_dir = tempfile.mkdtemp()  # 创建临时目录
+    def __init__(self, barcodes_dir="barcodes", output_dir="labels", mode="raster"):
+        """
+        :param mode: raster 栅格化后合成为图片PDF；vector 在template.pdf上直接放置条码页面和文本
+        """
+        self.barcodes_dir = barcodes_dir
+        self.output_dir = output_dir
+        self.mode = mode
         self.template_path = os.path.join(os.path.dirname(__file__), "template.png")
+        self.vector_template_path = os.path.join(os.path.dirname(__file__), "template.pdf")
+        self.raster_template = None
+        self.vector_template = None
         
         print(f"模板文件路径: {self.template_path}")
-        print(f"临时文件目录: {self.temp_dir}")
         
         self.setup_dirs()
 
@@ -24,137 +227,69 @@ class LabelGenerator:
         if not os.path.exists(self.barcodes_dir):
             os.makedirs(self.barcodes_dir)
 
+    def load_template(self):
+        """读取并缓存当前模式的模板：栅格模式为PreparedTemplate，矢量模式为VectorTemplate"""
+        if self.mode == "vector":
+            if self.vector_template is None:
+                self.vector_template = VectorTemplate(self.vector_template_path)
+            return self.vector_template
+        return self.load_raster_template()
+
+    def load_raster_template(self):
+        """读取并缓存栅格模板（PreparedTemplate），每个标签从它的副本开始；图片相关的方法在任何模式下都用它"""
+        if self.raster_template is None:
+            self.raster_template = PreparedTemplate(self.template_path)
+        return self.raster_template
+
+    @traced("label.rasterize")
     def convert_pdf_to_image(self, pdf_path):
-        """将PDF转换为图片"""
+        """将PDF转换为图片，直接在内存中返回PIL图片"""
         try:
             # 打开源PDF
-            doc = fitz.open(pdf_path)
-            page = doc[0]
+            with fitz.open(pdf_path) as doc:
+                # 将PDF页面转换为图片，使用RGB模式，增加分辨率
+                pix = doc[0].get_pixmap(matrix=fitz.Matrix(4, 4), alpha=False)  # 4x缩放以获得更好的质量
             
-            # 将PDF页面转换为图片，使用RGB模式，增加分辨率
-            pix = page.get_pixmap(matrix=fitz.Matrix(4, 4), alpha=False)  # 4x缩放以获得更好的质量
-            image_path = os.path.join(self.temp_dir, f"temp_sku_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-            pix.save(image_path)
+            # 直接共享pixmap的像素缓冲区，不经过PNG编码和临时文件
+            img = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
             
-            # 打开保存的图片并确保背景是白色
-            img = Image.open(image_path)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 创建一个白色背景
-            white_bg = Image.new('RGB', img.size, 'white')
-            white_bg.paste(img, mask=None)
-            
-            # 裁剪掉多余的空白边距
-            bbox = white_bg.getbbox()  # 获取非空白区域
-            if bbox:
-                white_bg = white_bg.crop(bbox)
-            
-            white_bg.save(image_path, quality=100)
-            
-            doc.close()
-            return image_path
+            # 裁剪掉多余的边距；裁剪得到独立的副本，之后pixmap可以释放
+            bbox = img.getbbox()
+            return img.crop(bbox) if bbox else img.copy()
             
         except Exception as e:
             print(f"转换PDF时出错: {str(e)}")
-            if 'doc' in locals():
-                doc.close()
             return None
 
     def write_sku_id(self, template_image, sku_id):
         """将SKU ID写入到模板图片中"""
         try:
-            # 创建可以在图片上绘制的对象
-            draw = ImageDraw.Draw(template_image)
-            
-            # 尝试加载Arial粗体字体，如果失败则尝试其他字体
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Arial Bold.ttf", 52)
-            except:
-                try:
-                    font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 52)
-                except:
-                    try:
-                        font = ImageFont.truetype("/Library/Fonts/Arial Bold.ttf", 52)
-                    except:
-                        font = ImageFont.load_default()
-            
-            # 获取模板尺寸
-            template_width, template_height = template_image.size
-            
-            # 计算写入位置（在"Batch Code:"后面）
-            text_x = int(template_width * 0.28)  # 左边距28%
-            text_y = int(template_height * 0.61)  # 距离顶部61.5%
-            
-            # 写入SKU ID（加粗效果）
-            # 通过轻微偏移多次绘制来实现描边加粗效果
-            offset = 1
-            for dx, dy in [(0,0), (offset,0), (0,offset), (offset,offset)]:
-                draw.text((text_x + dx, text_y + dy), f"{sku_id}", font=font, fill='black')
-            
+            self.load_raster_template().draw_sku_id(template_image, sku_id)
             return True
-            
         except Exception as e:
             print(f"写入SKU ID时出错: {str(e)}")
             return False
 
-    def merge_images(self, template_path, sku_image_path, output_path, sku_id):
-        """合并图片"""
+    @traced("label.compose")
+    def merge_images(self, template_path, sku_image, output_path, sku_id):
+        """
+        合并图片
+        :param sku_image: 条码图片（PIL图片或文件路径）
+        """
         try:
-            # 打开模板图片
-            template = Image.open(template_path)
-            if template.mode != 'RGB':
-                template = template.convert('RGB')
-                
-            # 获取模板尺寸
-            template_width, template_height = template.size
+            prepared = self.load_raster_template() if template_path == self.template_path else PreparedTemplate(template_path)
+            template = prepared.new_canvas()
             
-            # 定义SKU区域的相对位置（百分比）
-            LEFT_MARGIN_RATIO = 30/1314    # 左边距占模板宽度的4%
-            TOP_MARGIN_RATIO = 165/1124     # 上边距占模板高度的25%
-            WIDTH_RATIO = 1250/1314          # SKU区域宽度占模板宽度的92%
-            HEIGHT_RATIO = 435/1124          # SKU区域高度占模板高度的35%
-            
-            # 打开SKU图片
-            sku_image = Image.open(sku_image_path)
+            if isinstance(sku_image, str):
+                sku_image = Image.open(sku_image)
             if sku_image.mode != 'RGB':
                 sku_image = sku_image.convert('RGB')
             
-            # 计算实际的SKU区域位置
-            sku_box = (
-                int(template_width * LEFT_MARGIN_RATIO),   # 左
-                int(template_height * TOP_MARGIN_RATIO),   # 上
-                int(template_width * WIDTH_RATIO),        # 右
-                int(template_height * HEIGHT_RATIO)        # 下
-            )
-            
-            # 调整SKU图片大小以适应目标区域，保持宽高比
-            target_width = sku_box[2] - sku_box[0]
-            target_height = sku_box[3] - sku_box[1]
-            
-            # 计算缩放比例
-            width_ratio = target_width / sku_image.width
-            height_ratio = target_height / sku_image.height
-            ratio = min(width_ratio, height_ratio)
-            print(f"原始宽度: {sku_image.width}")
-            print(f"原始高度: {sku_image.height}")
-            print(f"缩放比例: {ratio}")
-            
-            new_width = int(sku_image.width * ratio)
-            new_height = int(sku_image.height * ratio)
-            
-            # 调整大小
-            sku_image = sku_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 计算居中位置
-            paste_x = sku_box[0] + (target_width - new_width) // 2
-            paste_y = sku_box[1] + (target_height - new_height) // 2
-            
-            # 将SKU图片粘贴到模板上
-            template.paste(sku_image, (paste_x, paste_y))
+            # 缩放到SKU区域并居中粘贴
+            prepared.place_barcode(template, sku_image)
             
             # 写入SKU ID
-            self.write_sku_id(template, sku_id)
+            prepared.draw_sku_id(template, sku_id)
             
             # 将结果保存为PDF，使用高质量设置
             template.save(output_path, "PDF", resolution=300.0, quality=100)
@@ -165,12 +300,16 @@ class LabelGenerator:
             print(f"合并图片时出错: {str(e)}")
             return False
 
+    @traced("label.sku", cat="sku")
     def generate_label(self, sku, barcode_pdf_path):
-        """为指定的SKU生成标签"""
+        """为指定的SKU生成标签，成功返回标签文件路径，标签文件名由条码文件名决定"""
         try:
             print(f"\n处理 SKU: {sku}")
             print(f"PDF路径: {barcode_pdf_path}")
             
+            if self.mode == "vector":
+                return self.generate_vector_label(sku, barcode_pdf_path)
+            
             # 检查模板文件是否存在
             if not os.path.exists(self.template_path):
                 print(f"错误：模板图片不存在: {self.template_path}")
@@ -183,21 +322,14 @@ class LabelGenerator:
                 return False
 
             # 生成输出文件路径
-            output_path = os.path.join(self.output_dir, f"label_{sku}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+            output_path = label_path_for(barcode_pdf_path, self.output_dir)
             
             # 合并图片，并传入SKU ID
             success = self.merge_images(self.template_path, sku_image, output_path, sku)
-            
-            # 清理临时文件
-            try:
-                if os.path.exists(sku_image):
-                    os.remove(sku_image)
-            except Exception as e:
-                print(f"清理临时文件时出错: {str(e)}")
 
             if success:
                 print(f"成功生成标签: {output_path}")
-                return True
+                return output_path
             else:
                 print("生成标签失败")
                 return False
@@ -206,34 +338,87 @@ class LabelGenerator:
             print(f"生成标签时出错: {str(e)}")
             return False
 
-    def process_all_skus(self):
-        """处理所有SKU的标签生成"""
-        # 获取所有条形码PDF文件
-        barcode_files = [f for f in os.listdir(self.barcodes_dir) if f.endswith('.pdf')]
-        print(f"找到 {len(barcode_files)} 个条形码PDF文件")
+    @traced("label.vector")
+    def generate_vector_label(self, sku, barcode_pdf_path):
+        """矢量模式：在template.pdf上放置条码页面并写入SKU ID"""
+        if not os.path.exists(self.vector_template_path):
+            print(f"错误：模板PDF不存在: {self.vector_template_path}")
+            return False
+        output_path = label_path_for(barcode_pdf_path, self.output_dir)
+        self.load_template().render(barcode_pdf_path, sku, output_path)
+        print(f"成功生成标签: {output_path}")
+        return output_path
+
+    @traced("label")
+    def process_all_skus(self, workers=1):
+        """
+        处理所有SKU的标签生成
+        :param workers: 进程数，大于1时用进程池并行生成（渲染和编码都是CPU密集型）
+        :return: 生成失败的 {SKU: 错误信息}
+        """
+        # 通过条码索引取每个SKU最新的条码：重复下载的文件只处理一次，SKU为空的文件被忽略
+        index = BarcodeIndex(self.barcodes_dir)
+        index.refresh()
+        barcodes = index.items()
+        print(f"找到 {len(barcodes)} 个SKU的条形码PDF文件")
         
-        for barcode_file in barcode_files:
-            # 从文件名中提取SKU，只提取数字部分
-            sku_match = re.search(r'sku_(\d+)_', barcode_file)
-            if sku_match:
-                sku = sku_match.group(1)  # 只获取数字部分
-                barcode_path = os.path.join(self.barcodes_dir, barcode_file)
-                self.generate_label(sku, barcode_path)
-            else:
-                print(f"无法从文件名中提取SKU: {barcode_file}")
+        # 条码内容没有变化、标签已存在且由同一模式生成时不重新生成
+        pending = [(sku, path) for sku, path in barcodes if not index.label_current(sku, self.mode)]
+        skipped = len(barcodes) - len(pending)
+        if skipped:
+            print(f"{skipped} 个SKU的标签已是最新，跳过")
+        
+        failures = {}
+        if workers > 1 and len(pending) > 1:
+            failures = self.render_parallel(pending, index, workers)
+        else:
+            for sku, barcode_path in pending:
+                output_path = self.generate_label(sku, barcode_path)
+                if output_path:
+                    index.mark_label(sku, output_path, self.mode)
+                else:
+                    failures[sku] = "生成标签失败"
+        index.save()
+        
+        print(f"\n共生成 {len(pending) - len(failures)} 个标签，失败 {len(failures)} 个")
+        for sku, error in failures.items():
+            print(f"  SKU {sku}: {error}")
+        return failures
 
-    def __del__(self):
-        """清理临时目录"""
-        try:
-            if hasattr(self, 'temp_dir'):
-                import shutil
-                shutil.rmtree(self.temp_dir)
-        except Exception as e:
-            print(f"清理临时目录时出错: {str(e)}")
+    def render_parallel(self, pending, index, workers):
+        """用进程池生成标签，单个文件失败不影响其他文件"""
+        workers = min(workers, len(pending))
+        print(f"使用 {workers} 个进程并行生成标签")
+        failures = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.barcodes_dir, self.output_dir, self.mode)) as executor:
+            futures = {executor.submit(_render_in_worker, sku, path): sku for sku, path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                sku = futures[future]
+                try:
+                    sku, output_path, error, seconds, pid = future.result()
+                except Exception as e:
+                    # 工作进程异常退出
+                    output_path, error, seconds, pid = None, str(e), 0.0, 0
+                tracer.record("label.sku", seconds, cat="sku", pid=pid, sku=sku)
+                if output_path:
+                    index.mark_label(sku, output_path, self.mode)
+                else:
+                    failures[sku] = error
+                print(f"[{done}/{len(pending)}] SKU {sku} {'完成' if output_path else '失败'}")
+        return failures
 
 def main():
-    generator = LabelGenerator()
-    generator.process_all_skus()
+    parser = argparse.ArgumentParser(description="根据条码PDF批量生成标签")
+    parser.add_argument("--mode", default="raster", choices=["raster", "vector"],
+                        help="raster 栅格化合成；vector 矢量合成，更快、文件更小")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行生成的进程数，1为逐个生成")
+    args = parser.parse_args()
+
+    generator = LabelGenerator(mode=args.mode)
+    generator.process_all_skus(workers=args.workers)
+    tracer.print_summary()
+    tracer.write()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
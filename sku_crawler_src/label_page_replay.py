@@ -0,0 +1,295 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from pagequery_replay import load_fixture_items
+
+LABEL_PAGE_PATH = "/main/product/label"
+
+# 商品条码页面的本地替身，保留处理器依赖的结构和类名：
+# 条码列表行和"查看条码"按钮、PGT_分页器、label-detail-modal条码弹窗、
+# 商品条码内容翻译弹窗、考试弹窗和PT_消息悬浮框。
+# "保存条码"与线上一样在页面内生成PDF blob并通过URL.createObjectURL下载
+LABEL_PAGE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>商品条码</title>
+<style>
+body { font-family: sans-serif; margin: 0; }
+.container { padding: 16px; }
+table { border-collapse: collapse; width: 100%; }
+td { border-bottom: 1px solid #eee; padding: 12px 8px; }
+a { color: #1677ff; cursor: pointer; }
+ul.PGT_outerWrapper_5-114-0 { list-style: none; display: flex; gap: 8px; padding: 0; }
+ul.PGT_outerWrapper_5-114-0 li { border: 1px solid #ddd; padding: 4px 10px; cursor: pointer; }
+li.PGT_pagerItemActive_5-114-0 { background: #1677ff; color: #fff; }
+li.PGT_disabled_5-114-0 { color: #ccc; pointer-events: none; }
+.MDL_mask_5-114-0 { position: fixed; inset: 0; background: rgba(0, 0, 0, 0.45); z-index: 1000; }
+.MDL_inner_5-114-0 { position: fixed; top: 20%; left: 30%; width: 40%; background: #fff; padding: 24px; z-index: 1001; }
+.PT_outerWrapper_5-114-0 { position: fixed; top: 0; left: 0; right: 0; height: 60%; background: #fffbe6; z-index: 900; }
+</style>
+</head>
+<body>
+<div class="container">
+  <table><tbody id="rows"></tbody></table>
+  <ul class="PGT_outerWrapper_5-114-0" id="pager"></ul>
+</div>
+<script>
+var CONFIG = __CONFIG__;
+var currentPage = 1;
+var totalPages = Math.max(1, Math.ceil(CONFIG.items.length / CONFIG.pageSize));
+
+function later(seconds, fn) { setTimeout(fn, Math.round(seconds * 1000)); }
+
+function renderRows() {
+    var tbody = document.getElementById('rows');
+    tbody.innerHTML = '';
+    var start = (currentPage - 1) * CONFIG.pageSize;
+    CONFIG.items.slice(start, start + CONFIG.pageSize).forEach(function(item, i) {
+        var tr = document.createElement('tr');
+        tr.innerHTML = '<td>' + item.name + '</td>'
+            + '<td>SKC ID：' + item.skc + '<br>SKU ID：' + item.sku + '</td>'
+            + '<td><a><span>查看条码</span></a></td>';
+        tr.querySelector('a').addEventListener('click', function() { openBarcode(item, start + i); });
+        tbody.appendChild(tr);
+    });
+}
+
+function renderPager() {
+    var pager = document.getElementById('pager');
+    pager.innerHTML = '';
+    function add(cls, text, target) {
+        var li = document.createElement('li');
+        li.className = cls;
+        li.textContent = text;
+        li.addEventListener('click', function() { goTo(target); });
+        pager.appendChild(li);
+    }
+    add('PGT_prev_5-114-0' + (currentPage === 1 ? ' PGT_disabled_5-114-0' : ''), '<', currentPage - 1);
+    for (var p = 1; p <= totalPages; p++) {
+        add('PGT_pagerItem_5-114-0' + (p === currentPage ? ' PGT_pagerItemActive_5-114-0' : ''), String(p), p);
+    }
+    add('PGT_next_5-114-0' + (currentPage === totalPages ? ' PGT_disabled_5-114-0' : ''), '>', currentPage + 1);
+}
+
+function goTo(page) {
+    if (page < 1 || page > totalPages || page === currentPage) return;
+    document.getElementById('rows').innerHTML = '';
+    later(CONFIG.pageLatency, function() {
+        currentPage = page;
+        renderRows();
+        renderPager();
+    });
+}
+
+function portal(html) {
+    var div = document.createElement('div');
+    div.setAttribute('data-testid', 'beast-core-portal');
+    div.innerHTML = html;
+    document.body.appendChild(div);
+    return div;
+}
+
+function modal(inner) {
+    return '<div class="MDL_outerWrapper_5-114-0"><div class="MDL_mask_5-114-0"></div>'
+        + '<div data-testid="beast-core-modal-inner" class="MDL_inner_5-114-0">' + inner + '</div></div>';
+}
+
+function button(text) { return '<button><span>' + text + '</span></button>'; }
+
+function field(label, value) {
+    return '<div><div class="label-value-module__label___3xQ5e">' + label + '</div><div>' + value + '</div></div>';
+}
+
+function openBarcode(item, index) {
+    if (item.needsTranslation) {
+        var translate = portal(modal('<div class="MDL_header_5-114-0">商品条码内容翻译</div>' + button('取消')));
+        translate.querySelector('button').addEventListener('click', function() { translate.remove(); });
+        return;
+    }
+    later(CONFIG.modalLatency, function() {
+        var detail = portal(modal('<div class="label-detail-modal_content__1Ib9A">'
+            + field('SKC', item.skc) + field('SKU', item.sku) + field('规格', item.spec)
+            + button('保存条码') + button('取消') + '</div>'));
+        var buttons = detail.querySelectorAll('button');
+        buttons[0].addEventListener('click', function() {
+            later(CONFIG.pdfLatency, function() { savePdf(item); });
+        });
+        buttons[1].addEventListener('click', function() { detail.remove(); });
+    });
+}
+
+// 与jsPDF输出结构相同的单页PDF，内容为SKU文本
+function buildPdf(item) {
+    var stream = 'BT /F1 6 Tf 20 20 Td (SKU ' + item.sku + ') Tj ET';
+    var objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 198.43 56.69] /Contents 4 0 R'
+            + ' /Resources << /Font << /F1 5 0 R >> >> >>',
+        '<< /Length ' + stream.length + ' >>\\nstream\\n' + stream + '\\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    ];
+    var pdf = '%PDF-1.3\\n';
+    var offsets = [];
+    objects.forEach(function(body, i) {
+        offsets.push(pdf.length);
+        pdf += (i + 1) + ' 0 obj\\n' + body + '\\nendobj\\n';
+    });
+    var xref = pdf.length;
+    pdf += 'xref\\n0 ' + (objects.length + 1) + '\\n0000000000 65535 f \\n';
+    offsets.forEach(function(offset) { pdf += String(offset).padStart(10, '0') + ' 00000 n \\n'; });
+    pdf += 'trailer\\n<< /Size ' + (objects.length + 1) + ' /Root 1 0 R /Info << /Producer (jsPDF 2.5.1) >> >>\\n'
+        + 'startxref\\n' + xref + '\\n%%EOF';
+    return new Blob([pdf], {type: 'application/pdf'});
+}
+
+function savePdf(item) {
+    var url = URL.createObjectURL(buildPdf(item));
+    var a = document.createElement('a');
+    a.href = url;
+    a.download = 'barcode_' + item.sku + '.pdf';
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+}
+
+function showPopups() {
+    if (CONFIG.examPopup) {
+        later(CONFIG.popupDelay, function() {
+            portal(modal('<div class="exam-detail_container__2_FBi">'
+                + '<div class="exam-detail_preparationExam__4THSb">请完成考试</div></div>'));
+        });
+    }
+    if (CONFIG.messagePopover) {
+        later(CONFIG.popupDelay * 1.5, function() {
+            portal('<div class="PT_outerWrapper_5-114-0"><div class="PP_popover_5-114-0">新消息</div></div>');
+        });
+    }
+}
+
+later(CONFIG.pageLatency, function() {
+    renderRows();
+    renderPager();
+    showPopups();
+});
+</script>
+</body>
+</html>
+"""
+
+
+class LabelPageServer:
+    """
+    商品条码页面的本地替身服务器，供NavigationHandler和BarcodeHandler离线测试和基准测试
+    商品数据以录制的pageQuery记录为模板生成，行数和各步骤延迟可配置
+    """
+
+    def __init__(self, rows: int = 100, page_size: int = 20, page_latency: float = 0.3,
+                 modal_latency: float = 0.2, pdf_latency: float = 0.1, translate_every: int = 0,
+                 exam_popup: bool = True, message_popover: bool = True, popup_delay: float = 0.5,
+                 fixture_dir: str = "fixtures/pagequery", host: str = "127.0.0.1", port: int = 0):
+        """
+        :param rows: 商品行总数
+        :param page_size: 每页行数
+        :param page_latency: 打开页面和翻页后列表渲染的延迟（秒）
+        :param modal_latency: 点击"查看条码"到条码弹窗出现的延迟（秒）
+        :param pdf_latency: 点击"保存条码"到生成PDF的延迟（秒）
+        :param translate_every: 每隔多少行出现一次翻译弹窗，0表示不出现
+        :param exam_popup: 是否在页面加载后弹出考试弹窗
+        :param message_popover: 是否在页面加载后弹出消息悬浮框
+        :param popup_delay: 页面渲染后弹窗出现的延迟（秒）
+        :param fixture_dir: 录制的pageQuery数据目录
+        :param host: 监听地址
+        :param port: 监听端口，0表示自动分配
+        """
+        self.rows = rows
+        self.config = {
+            "pageSize": page_size,
+            "pageLatency": page_latency,
+            "modalLatency": modal_latency,
+            "pdfLatency": pdf_latency,
+            "examPopup": exam_popup,
+            "messagePopover": message_popover,
+            "popupDelay": popup_delay,
+            "items": self.build_items(rows, translate_every, load_fixture_items(fixture_dir))
+        }
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def build_items(rows: int, translate_every: int, templates: List[Dict]) -> List[Dict]:
+        """生成页面上的商品行，SKU从1000000000开始递增，与ReplayServer一致"""
+        items = []
+        for index in range(rows):
+            template = templates[index % len(templates)]
+            specs = (template.get("productSkuSpecI18nMap") or {}).get("en") or []
+            items.append({
+                "sku": str(1000000000 + index),
+                "skc": str((template.get("labelCodeVO") or {}).get("productSkcId", 2000000000 + index)),
+                "name": template.get("productName") or "",
+                "spec": ", ".join(spec.get("specName", "") for spec in specs),
+                "needsTranslation": bool(translate_every) and (index + 1) % translate_every == 0
+            })
+        return items
+
+    def render_page(self) -> bytes:
+        config = json.dumps(self.config, ensure_ascii=False).replace("</", "<\\/")
+        return LABEL_PAGE_HTML.replace("__CONFIG__", config).encode('utf-8')
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server.lock:
+                    server.request_count += 1
+                path = self.path.split('?', 1)[0]
+                if path == LABEL_PAGE_PATH:
+                    self._send(200, server.render_page(), "text/html; charset=utf-8")
+                elif path == "/":
+                    # 首页直接跳转到商品条码页面
+                    self.send_response(302)
+                    self.send_header("Location", LABEL_PAGE_PATH)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self._send(404, b"not found", "text/plain; charset=utf-8")
+
+            def _send(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "LabelPageServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,257 @@
+import os
+import re
+import hashlib
+import argparse
+import fitz  # PyMuPDF
+from barcode_index import BarcodeIndex
+from label_generator import VectorTemplate, save_compressed
+from tracing import tracer, span, traced
+
+# 网格写法：列x行，例如 3x4、7×6
+GRID_PATTERN = re.compile(r'^\s*(\d+)\s*[xX×*]\s*(\d+)\s*$')
+# 字体描述中指向内嵌字体数据的键
+FONT_FILE_KEYS = ("FontFile", "FontFile2", "FontFile3")
+MM = 72 / 25.4
+# 默认每个文件的页数：整批上千个标签时分文件保存，内存不随标签数量一直增长
+SHEETS_PER_FILE = 50
+
+
+def parse_grid(text):
+    """解析"列x行"，返回 (列数, 行数)"""
+    match = GRID_PATTERN.match(text or '')
+    if not match or int(match.group(1)) < 1 or int(match.group(2)) < 1:
+        raise ValueError(f"网格格式应为 列x行，例如 3x4: {text}")
+    return int(match.group(1)), int(match.group(2))
+
+
+class LabelSheetWriter:
+    """
+    拼版：把标签按网格依次排到同一个PDF的多页上，整批打印时只需打开一个文件
+    标签直接由template.pdf和条码PDF矢量合成，模板在输出文档中只嵌入一次；
+    每个条码PDF都内嵌同样的两份字体，合入时按内容去重，只保留第一份，
+    内存和文件大小不随标签数量成倍增长。每满sheets_per_file页另存一个文件并释放内存
+
+    每个标签先画在一个与标签同尺寸的草稿页上，再把草稿页转成表单XObject引用到拼版页中：
+    PyMuPDF每次放置页面或写入文字都会扫描目标页上已有的全部字体，直接画在拼版页上时
+    一页越满越慢，草稿页上只有当前这一个标签
+    """
+
+    def __init__(self, output_path, template, columns=3, rows=4, paper="a4", margin=0,
+                 sheets_per_file=SHEETS_PER_FILE):
+        """
+        :param output_path: 输出PDF路径，分成多个文件时在文件名后加序号
+        :param template: VectorTemplate
+        :param columns: 每页列数
+        :param rows: 每页行数
+        :param paper: 纸张规格，如 a4、a4-l（横向）、letter
+        :param margin: 页边距（pt）
+        :param sheets_per_file: 每个文件的页数，0表示全部写到一个文件
+        """
+        self.output_path = output_path
+        self.template = template
+        self.columns = columns
+        self.rows = rows
+        self.paper_rect = fitz.paper_rect(paper)
+        self.sheets_per_file = sheets_per_file
+        self.cells = self._layout(margin)
+
+        self.doc = None
+        self.page = None
+        self.scratch = None
+        # 当前拼版页的内容流xref和绘制指令
+        self.contents_xref = 0
+        self.operations = []
+        self.sheets = 0
+        self.count = 0
+        self.part = 0
+        self.saved = []
+        # 字体数据的哈希 -> 输出文档中的xref
+        self.fonts = {}
+
+    def _layout(self, margin):
+        """计算每个格子里标签的位置：按格子大小等比缩小、居中，不放大到超过原尺寸"""
+        usable = self.paper_rect + (margin, margin, -margin, -margin)
+        cell_width = usable.width / self.columns
+        cell_height = usable.height / self.rows
+        label = self.template.rect
+        scale = min(cell_width / label.width, cell_height / label.height, 1.0)
+        width, height = label.width * scale, label.height * scale
+        if scale < 0.99:
+            print(f"{self.columns}x{self.rows} 网格放不下原尺寸标签，按 {scale:.0%} 缩放")
+
+        cells = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                x0 = usable.x0 + column * cell_width + (cell_width - width) / 2
+                y0 = usable.y0 + row * cell_height + (cell_height - height) / 2
+                cells.append(fitz.Rect(x0, y0, x0 + width, y0 + height))
+        return cells
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, barcode_pdf_path, sku_id):
+        """把一个SKU的标签排到下一个格子"""
+        slot = self.count % len(self.cells)
+        if slot == 0:
+            self._new_sheet()
+        first_xref = self.doc.xref_length()
+        try:
+            with fitz.open(barcode_pdf_path) as barcode:
+                self.template.place(self.scratch, self.scratch.rect, barcode, sku_id)
+            self._dedupe_fonts(first_xref)
+            form_xref = self._scratch_to_form()
+        finally:
+            # 失败时也清空草稿页，不影响下一个标签
+            self.doc.xref_set_key(self.scratch.xref, "Resources", "<<>>")
+            self.doc.xref_set_key(self.scratch.xref, "Contents", "null")
+        self._draw(form_xref, self.cells[slot])
+        self.count += 1
+
+    def _new_sheet(self):
+        if self.doc is not None and self.sheets_per_file and self.sheets >= self.sheets_per_file:
+            self._save(last=False)
+        if self.doc is None:
+            self.doc = fitz.open()
+            # 草稿页总是第一页
+            self.doc.new_page(width=self.template.rect.width, height=self.template.rect.height)
+            self.sheets = 0
+            self.fonts = {}
+        self.doc.new_page(width=self.paper_rect.width, height=self.paper_rect.height)
+        # 新增页面后之前取得的Page对象会失效，重新取
+        self.scratch = self.doc[0]
+        self.page = self.doc[-1]
+        self.contents_xref = self.doc.get_new_xref()
+        self.doc.update_object(self.contents_xref, "<<>>")
+        self.doc.xref_set_key(self.page.xref, "Contents", f"{self.contents_xref} 0 R")
+        self.doc.xref_set_key(self.page.xref, "Resources", "<</XObject<<>>>>")
+        self.operations = []
+        self.sheets += 1
+
+    def _scratch_to_form(self):
+        """把草稿页上的标签转成表单XObject"""
+        doc = self.doc
+        _, resources = doc.xref_get_key(self.scratch.xref, "Resources")
+        rect = self.scratch.rect
+        form_xref = doc.get_new_xref()
+        doc.update_object(form_xref, f"<</Type/XObject/Subtype/Form/BBox[0 0 {rect.width:g} {rect.height:g}]"
+                                     f"/Resources {resources}>>")
+        doc.update_stream(form_xref, self.scratch.read_contents())
+        return form_xref
+
+    def _draw(self, form_xref, cell):
+        """在拼版页的格子里引用标签XObject"""
+        name = f"L{self.count}"
+        self.doc.xref_set_key(self.page.xref, f"Resources/XObject/{name}", f"{form_xref} 0 R")
+        # PDF坐标原点在左下角
+        scale = cell.width / self.scratch.rect.width
+        bottom = self.paper_rect.height - cell.y1
+        self.operations.append(f"q {scale:g} 0 0 {scale:g} {cell.x0:g} {bottom:g} cm /{name} Do Q")
+        self.doc.update_stream(self.contents_xref, "\n".join(self.operations).encode())
+
+    def _dedupe_fonts(self, first_xref):
+        """
+        合入条码后，新字体数据与已有的相同时改为引用已有的那份，新数据清空，
+        不再被引用的对象在保存时被丢弃
+        只检查本次新增的对象
+        """
+        for xref in range(first_xref, self.doc.xref_length()):
+            if self.doc.xref_get_key(xref, "Type") != ("name", "/FontDescriptor"):
+                continue
+            for key in FONT_FILE_KEYS:
+                kind, value = self.doc.xref_get_key(xref, key)
+                if kind != "xref":
+                    continue
+                font_xref = int(value.split()[0])
+                digest = hashlib.sha256(self.doc.xref_stream_raw(font_xref)).hexdigest()
+                existing = self.fonts.setdefault(digest, font_xref)
+                if existing != font_xref:
+                    self.doc.xref_set_key(xref, key, f"{existing} 0 R")
+                    self.doc.update_stream(font_xref, b"")
+
+    def _part_path(self, last):
+        # 只有一个文件时不加序号
+        if not self.sheets_per_file or (last and self.part == 0):
+            return self.output_path
+        root, ext = os.path.splitext(self.output_path)
+        return f"{root}_{self.part + 1:03d}{ext or '.pdf'}"
+
+    def _save(self, last):
+        path = self._part_path(last)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with span("sheet.save", pages=self.sheets):
+            self.doc.delete_page(0)
+            save_compressed(self.doc, path)
+        self.doc.close()
+        self.doc = None
+        self.page = None
+        self.scratch = None
+        self.part += 1
+        self.saved.append(path)
+        print(f"已保存拼版文件: {path}（{self.sheets} 页）")
+
+    def close(self):
+        """保存最后一个文件，返回所有输出文件路径"""
+        if self.doc is not None:
+            self._save(last=True)
+        return self.saved
+
+
+@traced("sheet")
+def impose_labels(output_path=os.path.join("labels", "labels_sheet.pdf"), barcodes_dir="barcodes",
+                  columns=3, rows=4, paper="a4", margin=0, sheets_per_file=SHEETS_PER_FILE):
+    """
+    把条码目录中每个SKU最新的条码生成标签并拼版
+    :return: (输出文件路径列表, 失败的 {SKU: 错误信息})
+    """
+    template_path = os.path.join(os.path.dirname(__file__), "template.pdf")
+    if not os.path.exists(template_path):
+        print(f"错误：模板PDF不存在: {template_path}")
+        return [], {}
+
+    index = BarcodeIndex(barcodes_dir)
+    index.refresh()
+    barcodes = index.items()
+    print(f"找到 {len(barcodes)} 个SKU的条形码PDF文件，每页 {columns}x{rows} 个标签")
+
+    failures = {}
+    writer = LabelSheetWriter(output_path, VectorTemplate(template_path), columns, rows,
+                              paper, margin, sheets_per_file)
+    with writer:
+        for sku, barcode_path in barcodes:
+            try:
+                with span("sheet.label", cat="sku", sku=sku):
+                    writer.add(barcode_path, sku)
+            except Exception as e:
+                failures[sku] = str(e)
+                print(f"SKU {sku} 拼版失败: {str(e)}")
+
+    print(f"\n共拼版 {writer.count} 个标签，失败 {len(failures)} 个")
+    return writer.saved, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把标签按网格拼版到同一个PDF，用于整批打印")
+    parser.add_argument("--grid", type=parse_grid, default=(3, 4), help="每页的 列x行，默认3x4（A4上放原尺寸70x60mm标签）")
+    parser.add_argument("--paper", default="a4", help="纸张规格，如 a4、a4-l（横向）、letter")
+    parser.add_argument("--margin", type=float, default=0, help="页边距（毫米）")
+    parser.add_argument("--sheets-per-file", type=int, default=SHEETS_PER_FILE,
+                        help=f"每个文件的页数，默认{SHEETS_PER_FILE}，0表示全部写到一个文件")
+    parser.add_argument("--barcodes-dir", default="barcodes", help="条码PDF目录")
+    parser.add_argument("--output", default=os.path.join("labels", "labels_sheet.pdf"), help="输出PDF路径")
+    args = parser.parse_args()
+
+    columns, rows = args.grid
+    impose_labels(args.output, args.barcodes_dir, columns, rows, args.paper,
+                  args.margin * MM, args.sheets_per_file)
+    tracer.print_summary()
+    tracer.write()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import gzip
+import json
+import queue
+import shutil
+import atexit
+import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+
+class CompressedRotatingFileHandler(RotatingFileHandler):
+    """按大小轮转的日志处理器，轮转出的旧文件使用gzip压缩"""
+
+    def __init__(self, filename, max_bytes=20 * 1024 * 1024, backup_count=5, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.namer = self._gz_namer
+        self.rotator = self._gz_rotator
+
+    @staticmethod
+    def _gz_namer(name):
+        return f"{name}.gz"
+
+    @staticmethod
+    def _gz_rotator(source, dest):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """每条日志输出一行紧凑JSON，extra中的fields字段会合并到该行"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def setup_queue_logging(logger, log_file, level=logging.INFO, formatter=None,
+                        max_bytes=20 * 1024 * 1024, backup_count=5):
+    """
+    给logger挂上后台队列写日志：调用方只把记录放进内存队列，由单独线程负责格式化和写盘
+    :param logger: 要配置的logger
+    :param log_file: 日志文件路径
+    :param level: 文件记录的最低级别
+    :param formatter: 日志格式，默认为JsonLineFormatter
+    :param max_bytes: 单个日志文件的最大字节数，超过后轮转并压缩
+    :param backup_count: 保留的压缩文件数量
+    :return: 已启动的QueueListener
+    """
+    file_handler = CompressedRotatingFileHandler(log_file, max_bytes=max_bytes, backup_count=backup_count)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter or JsonLineFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # 退出时把队列中剩余的日志写完
+    atexit.register(listener.stop)
+    # 记下对应的listener，移除处理器时一并停止
+    queue_handler.listener = listener
+    logger.addHandler(queue_handler)
+    return listener
+
+
+def remove_log_handlers(logger):
+    """
+    移除并关闭logger上的全部处理器，队列处理器对应的listener先写完剩余日志再停止
+    :param logger: 要清理的logger
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        listener = getattr(handler, 'listener', None)
+        if listener is not None:
+            atexit.unregister(listener.stop)
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
+        handler.close()
@@ -1,23 +1,36 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-import time
-import requests
 from browser_handler import BrowserHandler
+from http_transport import create_session, copy_browser_cookies
+from session_store import SessionStore
+from tracing import traced
+from wait_policy import WaitPolicy, document_ready, element_present, element_clickable, url_matches, js_true, any_of
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 
+USERNAME_INPUT_LOCATOR = (By.XPATH, "//input[@placeholder='手机号码']")
+LOGIN_BUTTON_LOCATOR = (By.XPATH, "//button[contains(@class, 'BTN') and .//span[text()='登录']]")
+LOGGED_IN_URL_PATTERN = r"/main/|/settle/site-main"
+CHECKBOX_CHECKED_JS = """
+for (var checkbox of document.querySelectorAll('input[type="checkbox"]')) {
+    if (checkbox.checked) return true;
+}
+return false;
+"""
+
 class LoginHandler:
-    def __init__(self, driver, wait, session):
+    def __init__(self, driver, wait, session, waits=None):
         self.driver = driver
         self.wait = wait
         self.session = session
+        self.waits = waits or WaitPolicy(driver)
         self.base_url = "https://seller.kuajingmaihuo.com"
                 
     def get_mall_id(self):
         """获取商家ID"""
         try:
             # 等待页面完全加载
-            time.sleep(3)
+            self.waits.until("页面加载完成", document_ready(), timeout=10, required=False)
             
             # 尝试从页面源码中查找mallId相关信息
             page_source = self.driver.page_source
@@ -83,6 +96,7 @@ class LoginHandler:
             print(f"获取mallid失败: {str(e)}")
             return None
             
+    @traced("login.form")
     def login(self, username, password):
         """使用Selenium模拟登录"""
         try:
@@ -90,7 +104,11 @@ class LoginHandler:
             # 直接访问登录页面
             self.driver.get(f"{self.base_url}/login")
             print("已打开登录页面")
-            time.sleep(2)  # 等待页面完全加载
+            self.waits.until(
+                "登录页加载",
+                any_of(element_present(USERNAME_INPUT_LOCATOR), element_present((By.XPATH, "//div[text()='账号登录']"))),
+                timeout=10, required=False
+            )
             
             # 切换到账号登录标签（如果需要）
             try:
@@ -99,7 +117,6 @@ class LoginHandler:
                 )
                 account_login_tab.click()
                 print("已切换到账号登录")
-                time.sleep(1)
             except Exception as e:
                 print("已经在账号登录页面或切换失败")
             
@@ -124,9 +141,6 @@ class LoginHandler:
             # 查找并点击同意复选框
             print("查找并点击同意复选框...")
             try:
-                # 等待复选框可见
-                time.sleep(1)
-                
                 # 首先尝试使用label点击
                 try:
                     checkbox_label = self.wait.until(
@@ -166,14 +180,9 @@ class LoginHandler:
                             print("未找到未选中的复选框")
                 
                 # 验证复选框是否被选中
-                time.sleep(1)
-                checkbox_status = self.driver.execute_script("""
-                    var checkboxes = document.querySelectorAll('input[type="checkbox"]');
-                    for (var checkbox of checkboxes) {
-                        if (checkbox.checked) return true;
-                    }
-                    return false;
-                """)
+                checkbox_status = self.waits.until(
+                    "复选框选中", js_true(CHECKBOX_CHECKED_JS), timeout=2, poll=0.05, required=False
+                )
                 
                 if not checkbox_status:
                     print("警告：复选框可能未被正确选中")
@@ -183,9 +192,6 @@ class LoginHandler:
             except Exception as e:
                 print(f"处理复选框时出错: {str(e)}")
             
-            # 确保等待一下再进行下一步操作
-            time.sleep(1)
-            
             # 点击登录按钮
             print("点击登录按钮...")
             try:
@@ -227,23 +233,15 @@ class LoginHandler:
             
             # 检查是否登录成功
             try:
-                time.sleep(2)  # 等待登录请求完成
+                # 等待登录请求完成并跳转
+                self.waits.until("登录跳转", url_matches(LOGGED_IN_URL_PATTERN), timeout=10, required=False)
                 current_url = self.driver.current_url
                 if "/main/" in current_url or "/settle/site-main" in current_url:
                     print("检测到登录成功，当前URL:", current_url)
                     
-                    # 获取所有cookies
-                    cookies = self.driver.get_cookies()
-                    print(f"获取到 {len(cookies)} 个cookies")
-                    
-                    # 将cookies添加到requests session中
-                    for cookie in cookies:
-                        self.session.cookies.set(
-                            cookie['name'], 
-                            cookie['value'],
-                            domain=cookie.get('domain', ''),
-                            path=cookie.get('path', '/')
-                        )
+                    # 将浏览器cookies复制到共享的HTTP客户端中
+                    cookie_count = copy_browser_cookies(self.driver, self.session)
+                    print(f"获取到 {cookie_count} 个cookies")
                     return True
                 else:
                     print("登录失败，当前URL:", current_url)
@@ -263,6 +261,32 @@ class LoginHandler:
                 pass
             return False
 
+    @traced("login")
+    def ensure_logged_in(self, username, password, store=None):
+        """
+        优先复用保存的登录状态，只有在状态失效时才完整登录
+        :param username: 手机号码
+        :param password: 密码
+        :param store: SessionStore实例，为None时直接登录
+        :return: 登录成功返回True
+        """
+        if store is not None:
+            data = store.load()
+            if data:
+                print(f"找到保存的登录状态（保存于 {data.get('saved_at')}），正在检查是否有效...")
+                SessionStore.apply_to_session(data, self.session)
+                if SessionStore.probe(self.session):
+                    SessionStore.apply_to_driver(data, self.driver)
+                    copy_browser_cookies(self.driver, self.session)
+                    print("已复用保存的登录状态，跳过登录")
+                    return True
+
+        if not self.login(username, password):
+            return False
+        if store is not None:
+            store.save(self.driver)
+        return True
+
     def click_with_retry(self, element, max_retries=3):
         """点击元素的重试方法"""
         for attempt in range(max_retries):
@@ -273,7 +297,8 @@ class LoginHandler:
             except Exception as e:
                 if attempt < max_retries - 1:  # 如果不是最后一次尝试
                     print(f"点击失败，正在进行第{attempt + 2}次尝试: {str(e)}")
-                    time.sleep(1)  # 等待1秒后重试
+                    # 等按钮重新可点击（遮挡消失、恢复可用）后再重试
+                    self.waits.until("登录按钮可点击", EC.element_to_be_clickable(element), timeout=1, required=False)
                     continue
                 else:
                     print(f"点击失败，已重试{max_retries}次: {str(e)}")
@@ -283,23 +308,20 @@ class LoginHandler:
         """获取登录按钮，失败时重试"""
         for attempt in range(max_retries):
             try:
-                login_button = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'BTN') and .//span[text()='登录']]"))
-                )
+                login_button = self.waits.until("登录按钮", element_clickable(LOGIN_BUTTON_LOCATOR), timeout=8)
                 print("成功获取登录按钮")
                 return login_button
             except TimeoutException as e:
                 if attempt < max_retries - 1:
                     print(f"获取登录按钮超时，正在进行第{attempt + 2}次尝试")
-                    time.sleep(1)  # 等待1秒后重试
                     continue
                 else:
                     print(f"获取登录按钮失败，已重试{max_retries}次: {str(e)}")
                     raise e
     
 def main():
-    # 创建session对象
-    session = requests.Session()
+    # 创建共享的HTTP客户端
+    session = create_session()
     
     # 初始化浏览器
     driver, wait = BrowserHandler.init_browser()
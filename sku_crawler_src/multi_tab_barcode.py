@@ -0,0 +1,163 @@
+import threading
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.support.ui import WebDriverWait
+from barcode_handler import BarcodeHandler, EXTRACT_PAGE_JS, ROW_SKC_PATTERN
+from barcode_journal import ROW_SKU_PATTERN
+from browser_handler import BrowserHandler
+from navigation_handler import NavigationHandler
+
+
+class TabScheduler:
+    """
+    让多个线程在同一个浏览器会话里各自操作一个标签页
+    WebDriver同一时刻只能操作一个窗口：这里接管driver.execute，每条命令执行前加锁，
+    并在需要时切换到当前线程绑定的标签页。锁在整条命令执行期间一直占用，包括driver.get
+    等待页面加载的时间；只有命令之间的等待（WaitPolicy逐次轮询、元素出现）不占用锁，
+    各标签页的这部分等待可以重叠。因此多标签页运行时浏览器应使用eager加载策略，
+    让driver.get在DOM就绪后即返回，页面的其余加载由轮询等待完成
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        self.active_handle = driver.current_window_handle
+        self.original_execute = driver.execute
+        driver.execute = self.execute
+
+    def bind(self, handle):
+        """把当前线程绑定到指定标签页"""
+        self.local.handle = handle
+
+    def execute(self, driver_command, params=None):
+        handle = getattr(self.local, 'handle', None)
+        with self.lock:
+            if handle and handle != self.active_handle and driver_command != Command.SWITCH_TO_WINDOW:
+                self.original_execute(Command.SWITCH_TO_WINDOW, {'handle': handle})
+                self.active_handle = handle
+            response = self.original_execute(driver_command, params)
+            if driver_command == Command.SWITCH_TO_WINDOW:
+                self.active_handle = (params or {}).get('handle', self.active_handle)
+            return response
+
+    def restore(self):
+        """恢复driver原本的execute"""
+        self.driver.execute = self.original_execute
+
+
+class MultiTabBarcodeRunner:
+    """在同一个已登录的浏览器里开多个标签页，每个标签页负责一段页码，并发下载条码"""
+
+    def __init__(self, driver, tabs=3, journal=None, index=None, suppress_popups=True, block_resources=False,
+                 waits=None, base_url=None):
+        """
+        :param driver: 已登录并位于商品条码页面的webdriver
+        :param tabs: 标签页数量
+        :param journal: 各标签页共用的断点记录（BarcodeJournal）
+        :param index: 各标签页共用的条码内容索引（BarcodeIndex）
+        :param suppress_popups: 新标签页是否注入弹窗屏蔽脚本，与init_browser的设置一致
+        :param block_resources: 新标签页是否拦截资源，与init_browser的设置一致
+        :param waits: 各标签页导航时共用的WaitPolicy
+        :param base_url: 替换卖家中心地址，与第一个标签页的NavigationHandler一致
+        """
+        self.driver = driver
+        self.tabs = tabs
+        self.journal = journal
+        self.index = index
+        self.suppress_popups = suppress_popups
+        self.block_resources = block_resources
+        self.waits = waits
+        self.base_url = base_url
+        self.errors = []
+
+    def get_total_pages(self):
+        """从分页器读取总页数"""
+        page = self.driver.execute_script(EXTRACT_PAGE_JS, ROW_SKU_PATTERN.pattern, ROW_SKC_PATTERN)
+        return page['pager']['total']
+
+    @staticmethod
+    def split_pages(total_pages, workers):
+        """把1..total_pages切成连续的若干段，返回[(起始页, 结束页), ...]"""
+        workers = max(1, min(workers, total_pages))
+        size, extra = divmod(total_pages, workers)
+        ranges = []
+        start = 1
+        for i in range(workers):
+            end = start + size - 1 + (1 if i < extra else 0)
+            ranges.append((start, end))
+            start = end + 1
+        return ranges
+
+    def goto_page(self, handler, page):
+        """直接跳到起始页，不逐页翻"""
+        if page > 1 and not handler.go_to_page(page):
+            raise Exception(f"跳转到第 {page} 页失败")
+
+    def run_worker(self, scheduler, handle, start_page, end_page, navigate):
+        scheduler.bind(handle)
+        name = f"[标签页 {start_page}-{end_page}]"
+        try:
+            wait = WebDriverWait(self.driver, 8)
+            if navigate:
+                # init_browser的CDP设置只作用于第一个标签页，新标签页在导航前补上
+                BrowserHandler.setup_target(self.driver, suppress_popups=self.suppress_popups,
+                                            block_resources=self.block_resources)
+            navigation = NavigationHandler(self.driver, wait, waits=self.waits, base_url=self.base_url)
+            if navigate and not navigation.navigate_to_product_label():
+                raise Exception("导航到商品条码页面失败")
+
+            handler = BarcodeHandler(self.driver, wait, journal=self.journal, index=self.index, waits=self.waits)
+            self.goto_page(handler, start_page)
+            for page in range(start_page, end_page + 1):
+                # 已下载的SKU在process_row中按SKU跳过，不按页码跳过：列表变化后同一页的内容可能不同
+                print(f"\n{name} 处理第 {page} 页...")
+                if not handler.process_current_page(page):
+                    break
+                if page < end_page and not handler.go_to_next_page():
+                    print(f"{name} 翻页失败，停止")
+                    break
+            print(f"{name} 处理完成")
+        except Exception as e:
+            print(f"{name} 出错: {str(e)}")
+            self.errors.append((start_page, end_page, str(e)))
+
+    def run(self):
+        """打开标签页并等待所有标签页处理完成"""
+        total_pages = self.get_total_pages()
+        ranges = self.split_pages(total_pages, self.tabs)
+        print(f"共 {total_pages} 页，使用 {len(ranges)} 个标签页: {ranges}")
+
+        first_handle = self.driver.current_window_handle
+        handles = [first_handle]
+        for _ in ranges[1:]:
+            self.driver.switch_to.new_window('tab')
+            handles.append(self.driver.current_window_handle)
+        self.driver.switch_to.window(first_handle)
+
+        scheduler = TabScheduler(self.driver)
+        threads = []
+        try:
+            for i, (handle, (start_page, end_page)) in enumerate(zip(handles, ranges)):
+                thread = threading.Thread(
+                    target=self.run_worker,
+                    args=(scheduler, handle, start_page, end_page, i > 0),
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+        finally:
+            scheduler.restore()
+            self.driver.switch_to.window(first_handle)
+
+        # 所有标签页结束后，在第一个标签页里统一重试失败的行
+        if self.journal:
+            BarcodeHandler(self.driver, WebDriverWait(self.driver, 8), journal=self.journal,
+                           index=self.index).retry_failed()
+            if not self.errors:
+                self.journal.mark_run_complete()
+
+        if self.errors:
+            print(f"以下页码段处理失败: {self.errors}")
+        return not self.errors
@@ -1,22 +1,198 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-import time
-import requests
 from browser_handler import BrowserHandler
+from tracing import traced
+from wait_policy import (WaitPolicy, document_ready, network_idle, element_present, element_gone,
+                         url_changes, js_true, any_of, all_of)
+
+LABEL_PAGE_URL = "https://seller.kuajingmaihuo.com/main/product/label"
+HOME_PAGE_URL = "https://seller.kuajingmaihuo.com/"
+
+EXAM_POPUP_LOCATOR = (By.CSS_SELECTOR, '[class*="exam-detail_"]')
+MESSAGE_POPOVER_LOCATOR = (By.CSS_SELECTOR, 'div[data-testid="beast-core-portal"], [class*="PT_outerWrapper"], [class*="PP_outerWrapper"]')
+LABEL_ROWS_LOCATOR = (By.XPATH, "//td[.//a[.//span[text()='查看条码']]]/..")
+ENTER_BUTTON_JS = """
+if (document.getElementsByClassName('site-main_btnGroup__3fEoG').length > 0) return true;
+for (var el of document.querySelectorAll('div')) {
+    if (el.textContent.trim() === '进入 >') return true;
+}
+return false;
+"""
 
 class NavigationHandler:
-    def __init__(self, driver, wait):
+    def __init__(self, driver, wait, waits=None, base_url=None):
+        """
+        :param base_url: 替换卖家中心地址，例如指向本地的LabelPageServer
+        """
         self.driver = driver
         self.wait = wait
+        self.label_page_url = f"{base_url.rstrip('/')}/main/product/label" if base_url else LABEL_PAGE_URL
+        self.home_page_url = f"{base_url.rstrip('/')}/" if base_url else HOME_PAGE_URL
+        self.waits = waits or WaitPolicy(driver)
+        
+    def popups_suppressed(self):
+        """当前页面是否已由BrowserHandler注入的脚本屏蔽弹窗"""
+        try:
+            return bool(self.driver.execute_script("return !!window.__popupSuppressor;"))
+        except Exception:
+            return False
+        
+    @traced("navigation.popups")
+    def remove_popups(self):
+        """一次性移除考试弹窗和消息悬浮框，浏览器未注入弹窗屏蔽脚本时使用"""
+        # 首先处理考试弹窗
+        try:
+            # 弹窗随页面数据一起加载：出现弹窗或网络空闲后再处理
+            self.waits.until("考试弹窗出现", any_of(element_present(EXAM_POPUP_LOCATOR), network_idle(800)), timeout=5, required=False)
+            # 使用JavaScript移除考试弹窗
+            js_remove_exam = """
+            function removeExamPopup() {
+                // 1. 查找并移除考试弹窗
+                var examElements = [
+                    document.querySelector('.MDL_inner_5-114-0'),
+                    document.querySelector('.exam-detail_container__2_FBi'),
+                    document.querySelector('[data-testid="beast-core-modal-inner"]'),
+                    document.querySelector('.exam-detail_preparationExam__4THSb')
+                ].filter(Boolean);
+            
+                if (examElements.length > 0) {
+                    examElements.forEach(el => {
+                        // 查找最外层的modal容器
+                        var modal = el.closest('[data-testid="beast-core-modal-inner"]');
+                        if (modal) {
+                            var modalContainer = modal.parentElement;
+                            if (modalContainer) {
+                                modalContainer.remove();
+                            } else {
+                                modal.remove();
+                            }
+                        } else {
+                            el.remove();
+                        }
+                    });
+                    return true;
+                }
+            
+                // 2. 如果找不到具体元素，尝试移除所有modal相关元素
+                var modals = document.querySelectorAll('[class*="MDL_"][class*="modal"], [class*="exam-detail_"]');
+                if (modals.length > 0) {
+                    modals.forEach(el => el.remove());
+                    return true;
+                }
+            
+                return false;
+            }
+        
+            if (!removeExamPopup()) {
+                // 如果移除失败，尝试隐藏
+                var elements = document.querySelectorAll('.MDL_inner_5-114-0, .exam-detail_container__2_FBi, [data-testid="beast-core-modal-inner"]');
+                elements.forEach(function(el) {
+                    if (el) {
+                        el.style.display = 'none';
+                        el.style.visibility = 'hidden';
+                        el.style.opacity = '0';
+                        el.style.pointerEvents = 'none';
+                    }
+                });
+            }
+            return true;
+            """
+        
+            self.driver.execute_script(js_remove_exam)
+            print("已尝试移除考试弹窗")
+            self.waits.until("考试弹窗消失", element_gone(EXAM_POPUP_LOCATOR), timeout=3, required=False)
+        
+        except Exception as e:
+            print(f"处理考试弹窗失败: {str(e)}")
+    
+        # 然后处理消息悬浮框
+        try:
+            # 等待悬浮框出现
+            self.waits.until("消息悬浮框出现", any_of(element_present(MESSAGE_POPOVER_LOCATOR), network_idle(800)), timeout=5, required=False)
+        
+            # 使用JavaScript移除悬浮窗
+            js_code = """
+            function removePopup() {
+                // 1. 首先尝试移除整个portal
+                var portal = document.querySelector('div[data-testid="beast-core-portal"]');
+                if (portal) {
+                    portal.remove();
+                    return true;
+                }
+            
+                // 2. 尝试移除所有相关的弹窗类
+                var selectors = [
+                    '.PT_outerWrapper_5-114-0',
+                    '.PP_outerWrapper_5-114-0',
+                    '.PT_popover_5-114-0',
+                    '.PT_portalBottom_5-114-0',
+                    '.PT_portalWithArrow_5-114-0',
+                    '.PT_inCustom_5-114-0',
+                    '.PP_popover_5-114-0',
+                    '.PP_popoverWithTitle_5-114-0'
+                ];
+            
+                var elements = document.querySelectorAll(selectors.join(','));
+                if (elements.length > 0) {
+                    elements.forEach(function(el) {
+                        el.remove();
+                    });
+                    return true;
+                }
+            
+                // 3. 如果还是找不到，尝试移除所有可能的弹窗容器
+                var possiblePopups = document.querySelectorAll('div[class*="PT_"][class*="PP_"]');
+                if (possiblePopups.length > 0) {
+                    possiblePopups.forEach(function(el) {
+                        el.remove();
+                    });
+                    return true;
+                }
+            
+                return false;
+            }
+        
+            if (!removePopup()) {
+                // 如果移除失败，尝试隐藏
+                var selectors = [
+                    'div[data-testid="beast-core-portal"]',
+                    '.PT_outerWrapper_5-114-0',
+                    '.PP_outerWrapper_5-114-0',
+                    '.PT_popover_5-114-0',
+                    '.PT_portalBottom_5-114-0',
+                    '.PT_portalWithArrow_5-114-0',
+                    '.PT_inCustom_5-114-0',
+                    '.PP_popover_5-114-0',
+                    '.PP_popoverWithTitle_5-114-0'
+                ];
+            
+                document.querySelectorAll(selectors.join(',')).forEach(function(el) {
+                    el.style.display = 'none';
+                    el.style.visibility = 'hidden';
+                    el.style.opacity = '0';
+                    el.style.pointerEvents = 'none';
+                });
+            }
+            return true;
+            """
+        
+            self.driver.execute_script(js_code)
+            print("已尝试移除或隐藏消息悬浮框")
+            self.waits.until("消息悬浮框消失", element_gone(MESSAGE_POPOVER_LOCATOR), timeout=3, required=False)
+        
+        except Exception as e:
+            print(f"处理消息悬浮框失败: {str(e)}")
         
+    @traced("navigation")
     def navigate_to_product_label(self):
         """导航到商品条码管理页面"""
         try:
             # 直接访问商品条码页面
             print("正在访问商品条码页面...")
-            self.driver.get("https://seller.kuajingmaihuo.com/main/product/label")
-            time.sleep(5)  # 等待页面加载
+            self.driver.get(self.label_page_url)
+            # 等待可能的重定向（登录页/首页）完成
+            self.waits.until("打开商品条码页面", all_of(document_ready(), network_idle(500)), timeout=20, required=False)
             
             # 检查当前URL
             current_url = self.driver.current_url
@@ -28,10 +204,10 @@ class NavigationHandler:
                 return False
                 
             # 如果URL是首页，需要点击进入按钮
-            if current_url == "https://seller.kuajingmaihuo.com/":
+            if current_url == self.home_page_url:
                 print("在首页，尝试点击进入按钮...")
                 try:
-                    time.sleep(3)
+                    self.waits.until("首页进入按钮", js_true(ENTER_BUTTON_JS), timeout=10, required=False)
                     # 使用JavaScript点击进入按钮
                     js_code = """
                     var elements = document.getElementsByClassName('site-main_btnGroup__3fEoG');
@@ -50,10 +226,10 @@ class NavigationHandler:
                     """
                     if self.driver.execute_script(js_code):
                         print("已点击进入按钮")
-                        time.sleep(5)
+                        self.waits.until("离开首页", url_changes(current_url), timeout=15, required=False)
                         # 再次直接访问商品条码页面
-                        self.driver.get("https://seller.kuajingmaihuo.com/main/product/label")
-                        time.sleep(8)  # 增加等待时间
+                        self.driver.get(self.label_page_url)
+                        self.waits.until("重新打开商品条码页面", all_of(document_ready(), network_idle(500)), timeout=20, required=False)
                     else:
                         print("未找到进入按钮")
                         return False
@@ -69,147 +245,11 @@ class NavigationHandler:
                 )
                 print("页面加载完成")
                 
-                # 首先处理考试弹窗
-                try:
-                    time.sleep(2)
-                    # 使用JavaScript移除考试弹窗
-                    js_remove_exam = """
-                    function removeExamPopup() {
-                        // 1. 查找并移除考试弹窗
-                        var examElements = [
-                            document.querySelector('.MDL_inner_5-114-0'),
-                            document.querySelector('.exam-detail_container__2_FBi'),
-                            document.querySelector('[data-testid="beast-core-modal-inner"]'),
-                            document.querySelector('.exam-detail_preparationExam__4THSb')
-                        ].filter(Boolean);
-                        
-                        if (examElements.length > 0) {
-                            examElements.forEach(el => {
-                                // 查找最外层的modal容器
-                                var modal = el.closest('[data-testid="beast-core-modal-inner"]');
-                                if (modal) {
-                                    var modalContainer = modal.parentElement;
-                                    if (modalContainer) {
-                                        modalContainer.remove();
-                                    } else {
-                                        modal.remove();
-                                    }
-                                } else {
-                                    el.remove();
-                                }
-                            });
-                            return true;
-                        }
-                        
-                        // 2. 如果找不到具体元素，尝试移除所有modal相关元素
-                        var modals = document.querySelectorAll('[class*="MDL_"][class*="modal"], [class*="exam-detail_"]');
-                        if (modals.length > 0) {
-                            modals.forEach(el => el.remove());
-                            return true;
-                        }
-                        
-                        return false;
-                    }
-                    
-                    if (!removeExamPopup()) {
-                        // 如果移除失败，尝试隐藏
-                        var elements = document.querySelectorAll('.MDL_inner_5-114-0, .exam-detail_container__2_FBi, [data-testid="beast-core-modal-inner"]');
-                        elements.forEach(function(el) {
-                            if (el) {
-                                el.style.display = 'none';
-                                el.style.visibility = 'hidden';
-                                el.style.opacity = '0';
-                                el.style.pointerEvents = 'none';
-                            }
-                        });
-                    }
-                    return true;
-                    """
-                    
-                    self.driver.execute_script(js_remove_exam)
-                    print("已尝试移除考试弹窗")
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    print(f"处理考试弹窗失败: {str(e)}")
-                
-                # 然后处理消息悬浮框
-                try:
-                    # 等待悬浮框出现
-                    time.sleep(2)
-                    
-                    # 使用JavaScript移除悬浮窗
-                    js_code = """
-                    function removePopup() {
-                        // 1. 首先尝试移除整个portal
-                        var portal = document.querySelector('div[data-testid="beast-core-portal"]');
-                        if (portal) {
-                            portal.remove();
-                            return true;
-                        }
-                        
-                        // 2. 尝试移除所有相关的弹窗类
-                        var selectors = [
-                            '.PT_outerWrapper_5-114-0',
-                            '.PP_outerWrapper_5-114-0',
-                            '.PT_popover_5-114-0',
-                            '.PT_portalBottom_5-114-0',
-                            '.PT_portalWithArrow_5-114-0',
-                            '.PT_inCustom_5-114-0',
-                            '.PP_popover_5-114-0',
-                            '.PP_popoverWithTitle_5-114-0'
-                        ];
-                        
-                        var elements = document.querySelectorAll(selectors.join(','));
-                        if (elements.length > 0) {
-                            elements.forEach(function(el) {
-                                el.remove();
-                            });
-                            return true;
-                        }
-                        
-                        // 3. 如果还是找不到，尝试移除所有可能的弹窗容器
-                        var possiblePopups = document.querySelectorAll('div[class*="PT_"][class*="PP_"]');
-                        if (possiblePopups.length > 0) {
-                            possiblePopups.forEach(function(el) {
-                                el.remove();
-                            });
-                            return true;
-                        }
-                        
-                        return false;
-                    }
-                    
-                    if (!removePopup()) {
-                        // 如果移除失败，尝试隐藏
-                        var selectors = [
-                            'div[data-testid="beast-core-portal"]',
-                            '.PT_outerWrapper_5-114-0',
-                            '.PP_outerWrapper_5-114-0',
-                            '.PT_popover_5-114-0',
-                            '.PT_portalBottom_5-114-0',
-                            '.PT_portalWithArrow_5-114-0',
-                            '.PT_inCustom_5-114-0',
-                            '.PP_popover_5-114-0',
-                            '.PP_popoverWithTitle_5-114-0'
-                        ];
-                        
-                        document.querySelectorAll(selectors.join(',')).forEach(function(el) {
-                            el.style.display = 'none';
-                            el.style.visibility = 'hidden';
-                            el.style.opacity = '0';
-                            el.style.pointerEvents = 'none';
-                        });
-                    }
-                    return true;
-                    """
-                    
-                    self.driver.execute_script(js_code)
-                    print("已尝试移除或隐藏消息悬浮框")
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    print(f"处理消息悬浮框失败: {str(e)}")
+                # 浏览器已注入弹窗屏蔽脚本时，弹窗挂载即被隐藏，不需要等待和移除
+                if self.popups_suppressed():
+                    print("弹窗屏蔽脚本已生效，跳过弹窗处理")
+                else:
+                    self.remove_popups()
                     
             except Exception as e:
                 print(f"等待页面加载完成失败: {str(e)}")
@@ -221,8 +261,8 @@ class NavigationHandler:
                 return False
                 
             print("成功导航到商品条码页面")
-            # 额外等待，确保页面完全加载
-            time.sleep(5)
+            # 等待条码列表渲染完成
+            self.waits.until("条码列表就绪", element_present(LABEL_ROWS_LOCATOR), timeout=15, required=False)
             return True
                 
         except Exception as e:
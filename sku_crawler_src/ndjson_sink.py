@@ -0,0 +1,79 @@
+import os
+import json
+import time
+from typing import Dict, Iterable, Iterator
+
+
+class NdjsonWriter:
+    """
+    逐批写入的NDJSON文件，每行一条JSON记录
+    每批写完立即flush，其他进程可以边写边读（tail）
+    """
+
+    def __init__(self, filename: str, fsync: bool = False, append: bool = True):
+        """
+        :param filename: 输出文件路径
+        :param fsync: 每批写完后是否调用fsync，保证进程崩溃后数据已落盘
+        :param append: 为True时追加到已有文件，为False时先清空文件
+        """
+        self.filename = filename
+        self.fsync = fsync
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.file = open(filename, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record: Dict) -> None:
+        """写入单条记录"""
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Dict]) -> int:
+        """
+        写入一批记录并刷新到磁盘
+        :return: 写入的记录数
+        """
+        lines = [json.dumps(record, ensure_ascii=False, separators=(',', ':')) for record in records]
+        if lines:
+            # 整批拼成一次写入，读取方不会看到写了一半的批次
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+        return len(lines)
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_ndjson(filename: str, follow: bool = False, poll_interval: float = 0.5) -> Iterator[Dict]:
+    """
+    逐行读取NDJSON文件
+    :param filename: 文件路径
+    :param follow: 为True时读到末尾后继续等待新写入的行（类似tail -f），由调用方决定何时停止
+    :param poll_interval: follow模式下的轮询间隔（秒）
+    :return: 记录生成器
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        buffer = ''
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            buffer += line
+            if not buffer.endswith('\n'):
+                # 写入方还没写完这一行
+                continue
+            if buffer.strip():
+                yield json.loads(buffer)
+            buffer = ''
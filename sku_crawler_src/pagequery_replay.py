@@ -0,0 +1,197 @@
+import os
+import copy
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from sku_handler import PAGE_QUERY_PATH
+
+# 没有录制数据时使用的示例记录，结构与线上pageItems一致
+SAMPLE_ITEM = {
+    "labelCodeVO": {
+        "supplierId": 634418219677180,
+        "productId": 350965497,
+        "productSkcId": 3433738602,
+        "productSkuId": 6957499975,
+        "labelCode": 51932307588,
+        "skcExtCode": "",
+        "skuExtCode": ""
+    },
+    "productId": 350965497,
+    "productName": "示例商品",
+    "leafCat": {"catId": 11800, "catName": "化妆品收纳盒", "catEnName": None, "catType": None},
+    "displayImage": "",
+    "productSkuSpecI18nMap": {
+        "en": [
+            {"parentSpecId": 1001, "parentSpecName": "Color", "specId": 44612, "specName": "Burgundy"},
+            {"parentSpecId": 15998553, "parentSpecName": "Quantity", "specId": 18289186, "specName": "1pc"}
+        ]
+    },
+    "productOrigin": {"countryShortName": "CN", "countryName": "China"}
+}
+
+
+class PageQueryRecorder:
+    """把真实的pageQuery请求和响应保存到fixture目录，供回放服务器使用"""
+
+    def __init__(self, fixture_dir: str = "fixtures/pagequery"):
+        self.fixture_dir = fixture_dir
+        self.lock = threading.Lock()
+        if not os.path.exists(fixture_dir):
+            os.makedirs(fixture_dir)
+
+    def record(self, payload: Dict, response, elapsed: float) -> None:
+        """
+        保存一次请求/响应
+        :param payload: 请求体
+        :param response: HTTP响应
+        :param elapsed: 请求耗时（秒）
+        """
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+
+        exchange = {
+            "recorded_at": datetime.now().isoformat(timespec='seconds'),
+            "request": payload,
+            "status": response.status_code,
+            "elapsed": round(elapsed, 4),
+            "body": body
+        }
+        filename = os.path.join(self.fixture_dir, f"page_{payload.get('page', 0):04d}.json")
+        with self.lock:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(exchange, f, ensure_ascii=False)
+
+
+def load_fixture_items(fixture_dir: str = "fixtures/pagequery") -> List[Dict]:
+    """读取录制的pageItems，没有录制数据时返回示例记录"""
+    items = []
+    if os.path.isdir(fixture_dir):
+        for name in sorted(os.listdir(fixture_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(fixture_dir, name), 'r', encoding='utf-8') as f:
+                exchange = json.load(f)
+            body = exchange.get('body')
+            if isinstance(body, dict):
+                items.extend((body.get('result') or {}).get('pageItems') or [])
+    return items or [SAMPLE_ITEM]
+
+
+class ReplayServer:
+    """
+    本地替身服务器，模拟seller center的pageQuery接口
+    以录制的记录为模板生成指定规模的目录，可配置延迟和错误率
+    """
+
+    def __init__(self, fixture_dir: str = "fixtures/pagequery", catalogue_size: Optional[int] = None,
+                 latency: float = 0.2, jitter: float = 0.05, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param fixture_dir: 录制数据目录
+        :param catalogue_size: 模拟的SKU总数，默认等于录制的记录数
+        :param latency: 每个请求的基础延迟（秒）
+        :param jitter: 延迟的随机波动（秒）
+        :param error_rate: 返回500的概率
+        :param throttle_rate: 返回429的概率
+        :param host: 监听地址
+        :param port: 监听端口，0表示自动分配
+        """
+        self.templates = load_fixture_items(fixture_dir)
+        self.catalogue_size = catalogue_size if catalogue_size is not None else len(self.templates)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def make_item(self, index: int) -> Dict:
+        """以模板为基础生成第index条记录，productSkuId保证唯一"""
+        item = copy.deepcopy(self.templates[index % len(self.templates)])
+        item.setdefault('labelCodeVO', {})['productSkuId'] = 1000000000 + index
+        return item
+
+    def build_page(self, page: int, page_size: int) -> Dict:
+        start = (page - 1) * page_size
+        end = min(start + page_size, self.catalogue_size)
+        return {
+            "success": True,
+            "errorCode": 1000000,
+            "errorMsg": None,
+            "result": {
+                "total": self.catalogue_size,
+                "pageItems": [self.make_item(i) for i in range(start, end)]
+            }
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                with server.lock:
+                    server.request_count += 1
+
+                time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+                if self.path != PAGE_QUERY_PATH:
+                    self._send(404, {"success": False, "errorMsg": "not found"})
+                    return
+                roll = random.random()
+                if roll < server.throttle_rate:
+                    self._send(429, {"success": False, "errorMsg": "too many requests"}, {"Retry-After": "1"})
+                    return
+                if roll < server.throttle_rate + server.error_rate:
+                    self._send(500, {"success": False, "errorMsg": "internal error"})
+                    return
+
+                body = server.build_page(int(payload.get('page', 1)), int(payload.get('pageSize', 50)))
+                self._send(200, body)
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "ReplayServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,203 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from http_transport import TRANSPORT_ERRORS
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限速器
+    每次请求前取一个令牌；开始时按倍数提速（慢启动），遇到429/503或延迟过高时成倍降低速率，
+    之后请求成功时缓慢提高速率，从而逐步逼近服务端能接受的最快速率
+    """
+
+    def __init__(self, rate: float = 2.0, min_rate: float = 0.2, max_rate: float = 20.0,
+                 burst: Optional[float] = None, target_latency: float = 1.5,
+                 increase_step: float = 0.2, decrease_factor: float = 0.5):
+        """
+        :param rate: 初始速率（请求/秒）
+        :param min_rate: 速率下限
+        :param max_rate: 速率上限
+        :param burst: 令牌桶容量，默认等于当前速率
+        :param target_latency: 目标响应时间（秒），超过后降低速率
+        :param increase_step: 每次成功后增加的速率
+        :param decrease_factor: 被限流或出错时速率乘以的系数
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        # 慢启动阶段按倍数提速，第一次被限流或变慢后改为加性增长
+        self.slow_start = True
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('sku_crawler')
+
+    def _capacity(self) -> float:
+        return self.burst if self.burst else max(1.0, self.rate)
+
+    def acquire(self) -> float:
+        """
+        阻塞直到拿到一个令牌
+        :return: 实际等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self._capacity(), self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                else:
+                    delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_response(self, status_code: int, latency: float, retry_after: Optional[float] = None) -> None:
+        """
+        根据响应结果调整速率
+        :param status_code: HTTP状态码
+        :param latency: 本次请求耗时（秒）
+        :param retry_after: 服务端要求的等待秒数
+        """
+        with self.lock:
+            if status_code in (429, 503):
+                self._decrease(f"被限流，状态码 {status_code}")
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif status_code >= 500:
+                # 普通服务端错误不一定是压力导致，降幅小于限流
+                self._decrease(f"服务端错误，状态码 {status_code}", 0.8)
+            elif latency > self.target_latency:
+                # 响应变慢说明服务端压力变大，小幅降速
+                self.slow_start = False
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            elif self.slow_start:
+                self.rate = min(self.max_rate, self.rate * 1.25)
+            else:
+                # 加性增长，速率越高增长越慢
+                self.rate = min(self.max_rate, self.rate + self.increase_step / max(1.0, self.rate))
+
+    def on_error(self) -> None:
+        """请求异常（超时、连接失败等）时降低速率"""
+        with self.lock:
+            self._decrease("请求异常", 0.8)
+
+    def _decrease(self, reason: str, factor: Optional[float] = None) -> None:
+        old_rate = self.rate
+        self.slow_start = False
+        self.rate = max(self.min_rate, self.rate * (factor or self.decrease_factor))
+        self.tokens = min(self.tokens, 1.0)
+        self.logger.warning(f"{reason}，速率由 {old_rate:.2f} 降至 {self.rate:.2f} 请求/秒")
+
+
+class RetryPolicy:
+    """指数退避加随机抖动的重试策略"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        """
+        :param max_retries: 首次请求之后的最大重试次数
+        :param base_delay: 第一次重试的基准等待秒数
+        :param max_delay: 单次等待的上限
+        :param retry_statuses: 需要重试的HTTP状态码
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        计算第attempt次重试前的等待时间（full jitter）
+        :param attempt: 重试序号，从1开始
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host: str = "seller.kuajingmaihuo.com", **kwargs) -> AdaptiveRateLimiter:
+    """
+    获取某个域名共享的限速器，同一进程内访问同一域名的所有处理器共用一个令牌桶
+    :param host: 域名或完整URL
+    :param kwargs: 首次创建时传给AdaptiveRateLimiter的参数
+    """
+    if "://" in host:
+        host = urlparse(host).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(**kwargs)
+        return _limiters[host]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头，支持秒数和HTTP日期两种格式"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def request_with_retry(session, method: str, url: str, limiter: Optional[AdaptiveRateLimiter] = None,
+                       policy: Optional[RetryPolicy] = None, **kwargs):
+    """
+    经过限速器发送请求，遇到可重试的状态码或网络异常时按退避策略重试
+    :param session: requests.Session或httpx.Client
+    :param method: HTTP方法
+    :param url: 请求地址
+    :param limiter: 限速器，默认使用该域名共享的限速器
+    :param policy: 重试策略
+    :param kwargs: 透传给session.request的参数
+    :return: 最后一次的响应；全部重试都抛异常时抛出最后一次的异常
+    """
+    limiter = limiter or get_limiter(url)
+    policy = policy or RetryPolicy()
+    logger = logging.getLogger('sku_crawler')
+
+    for attempt in range(policy.max_retries + 1):
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except TRANSPORT_ERRORS as e:
+            limiter.on_error()
+            if attempt >= policy.max_retries:
+                raise
+            delay = policy.backoff(attempt + 1)
+            logger.warning(f"请求异常: {str(e)}，{delay:.2f} 秒后重试 ({attempt + 1}/{policy.max_retries})")
+            time.sleep(delay)
+            continue
+
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        limiter.on_response(response.status_code, time.monotonic() - start, retry_after)
+
+        if response.status_code not in policy.retry_statuses or attempt >= policy.max_retries:
+            return response
+
+        delay = max(policy.backoff(attempt + 1), retry_after or 0)
+        logger.warning(f"状态码 {response.status_code}，{delay:.2f} 秒后重试 ({attempt + 1}/{policy.max_retries})")
+        time.sleep(delay)
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+from datetime import datetime
+from sku_handler import DEFAULT_HEADERS, PAGE_QUERY_PATH
+
+BASE_URL = "https://seller.kuajingmaihuo.com"
+
+DUMP_LOCAL_STORAGE_JS = """
+var data = {};
+for (var i = 0; i < localStorage.length; i++) {
+    var key = localStorage.key(i);
+    data[key] = localStorage.getItem(key);
+}
+return data;
+"""
+
+RESTORE_LOCAL_STORAGE_JS = """
+var data = arguments[0];
+for (var key in data) {
+    localStorage.setItem(key, data[key]);
+}
+return Object.keys(data).length;
+"""
+
+
+class SessionStore:
+    """保存登录成功后的cookies和localStorage，下次运行时恢复，避免重复登录"""
+
+    def __init__(self, session_dir=".session"):
+        self.session_dir = session_dir
+        self.session_file = os.path.join(session_dir, "session.json")
+
+    def save(self, driver):
+        """
+        保存浏览器当前的cookies和卖家中心的localStorage
+        :param driver: 已登录的webdriver
+        """
+        if not os.path.exists(self.session_dir):
+            os.makedirs(self.session_dir)
+
+        data = {
+            "saved_at": datetime.now().isoformat(timespec='seconds'),
+            "cookies": driver.get_cookies(),
+            "local_storage": {}
+        }
+        if driver.current_url.startswith(BASE_URL):
+            data["local_storage"] = driver.execute_script(DUMP_LOCAL_STORAGE_JS) or {}
+
+        temp_file = f"{self.session_file}.part"
+        # 文件中包含登录凭据，创建时就只允许当前用户读写；先删掉上次残留的临时文件，
+        # 否则O_CREAT不会改变已有文件的权限
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, self.session_file)
+        print(f"登录状态已保存: {self.session_file}")
+
+    def load(self):
+        """读取保存的登录状态，不存在或损坏时返回None"""
+        if not os.path.exists(self.session_file):
+            return None
+        try:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取登录状态失败: {str(e)}")
+            return None
+
+    def clear(self):
+        """删除保存的登录状态"""
+        if os.path.exists(self.session_file):
+            os.remove(self.session_file)
+
+    @staticmethod
+    def apply_to_session(data, session):
+        """把保存的cookies放进HTTP客户端"""
+        for cookie in data.get("cookies", []):
+            session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain', ''),
+                path=cookie.get('path', '/')
+            )
+
+    @staticmethod
+    def apply_to_driver(data, driver):
+        """
+        把保存的cookies和localStorage写回浏览器
+        使用持久化的Chrome用户目录时浏览器本身已有这些数据，这里只补充缺失的部分
+        """
+        if not driver.current_url.startswith(BASE_URL):
+            driver.get(BASE_URL)
+
+        existing = {(c['name'], c.get('domain')) for c in driver.get_cookies()}
+        for cookie in data.get("cookies", []):
+            if (cookie['name'], cookie.get('domain')) in existing:
+                continue
+            cookie = {k: v for k, v in cookie.items() if k in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry', 'sameSite')}
+            try:
+                driver.add_cookie(cookie)
+            except Exception:
+                # 与当前页面域名不匹配的cookie无法通过WebDriver写入
+                continue
+
+        if data.get("local_storage"):
+            driver.execute_script(RESTORE_LOCAL_STORAGE_JS, data["local_storage"])
+
+    @staticmethod
+    def probe(session, timeout=5):
+        """
+        用一次最小的接口请求检查登录状态是否有效
+        :param session: 已放入cookies的HTTP客户端
+        :return: 有效返回True
+        """
+        start = time.perf_counter()
+        try:
+            response = session.post(
+                f"{BASE_URL}{PAGE_QUERY_PATH}",
+                headers=DEFAULT_HEADERS,
+                json={"page": 1, "pageSize": 1},
+                timeout=timeout
+            )
+            valid = response.status_code == 200 and bool(response.json().get('success'))
+        except Exception as e:
+            print(f"检查登录状态失败: {str(e)}")
+            valid = False
+        print(f"登录状态{'有效' if valid else '已失效'}（检查耗时 {time.perf_counter() - start:.2f} 秒）")
+        return valid
@@ -1,4 +1,3 @@
-import requests
 import time
 from login_handler import LoginHandler
 from browser_handler import BrowserHandler
@@ -6,41 +5,101 @@ from navigation_handler import NavigationHandler
 from sku_handler import SkuHandler
 from barcode_handler import BarcodeHandler
 from label_generator import LabelGenerator
+from http_transport import create_session
+from barcode_api import ApiBarcodeHandler
+from multi_tab_barcode import MultiTabBarcodeRunner
+from wait_policy import WaitPolicy
+from session_store import SessionStore
+from barcode_journal import BarcodeJournal
+from barcode_index import BarcodeIndex
+from tracing import tracer, span
+
+# 条码获取方式：browser 通过页面逐个点击保存；api 直接用接口数据批量生成，无需打开条码页面
+BARCODE_MODE = "browser"
+# browser模式下并发处理的标签页数量，1为单标签页逐页处理
+BARCODE_TABS = 1
+# 无头模式和资源拦截（图片、字体、统计脚本）
+HEADLESS = False
+BLOCK_RESOURCES = False
+# 登录状态和Chrome用户目录，下次运行时复用以跳过登录
+SESSION_DIR = ".session"
+CHROME_PROFILE_DIR = ".chrome_profile"
+# 连接已运行并登录的Chrome（以 --remote-debugging-port=9222 启动），None表示每次启动新浏览器
+DEBUGGER_ADDRESS = None
+# 条码下载的断点记录，中断后重新运行时跳过已下载的SKU
+JOURNAL_FILE = "barcodes/.journal.jsonl"
 
 
 def main():
-    # 创建session对象
-    session = requests.Session()
+    # 创建共享的HTTP客户端（连接池、压缩协商），登录和SKU请求共用
+    session = create_session()
     
     # 初始化浏览器
-    driver, wait = BrowserHandler.init_browser()
+    driver, wait = BrowserHandler.init_browser(
+        headless=HEADLESS,
+        block_resources=BLOCK_RESOURCES,
+        user_data_dir=CHROME_PROFILE_DIR,
+        debugger_address=DEBUGGER_ADDRESS,
+        # 多标签页时driver.get会占住各标签页共用的命令锁，DOM就绪即返回，其余由显式等待完成
+        page_load_strategy="eager" if BARCODE_MODE == "browser" and BARCODE_TABS > 1 else "normal"
+    )
+    # 登录和导航共用的等待策略，结束时打印各步骤实际等待时间
+    waits = WaitPolicy(driver)
     
     try:
         # 登录处理
-        login_handler = LoginHandler(driver, wait, session)
+        login_handler = LoginHandler(driver, wait, session, waits=waits)
         username = '18237084494'
         password = 'Isa981213'
         
-        if not login_handler.login(username, password):
+        if not login_handler.ensure_logged_in(username, password, SessionStore(SESSION_DIR)):
             print("登录失败")
             return
             
         print("登录成功")
+
+        if BARCODE_MODE == "api":
+            print("\n开始通过接口批量生成商品条码...")
+            sku_handler = SkuHandler(session, log_mode="compact")
+            index = BarcodeIndex()
+            index.refresh()
+            try:
+                ApiBarcodeHandler(sku_handler, index=index).export_barcodes()
+            finally:
+                sku_handler.close()
+            print("条码获取完成")
+            return
         
         # 导航到商品条码页面
-        navigation_handler = NavigationHandler(driver, wait)
+        navigation_handler = NavigationHandler(driver, wait, waits=waits)
         if not navigation_handler.navigate_to_product_label():
             print("导航失败")
             return
             
         print("导航成功")
-        # 等待页面完全加载和权限初始化
-        time.sleep(5)
+        metrics = BrowserHandler.measure_page_load(driver)
+        if metrics:
+            print(f"条码页面加载耗时 {metrics['load_ms']} ms，传输 {metrics['bytes'] / 1024:.1f} KB，"
+                  f"共 {metrics['requests']} 个请求（资源拦截: {'开' if BLOCK_RESOURCES else '关'}）")
         
         # 获取所有条码
         print("\n开始获取商品条码...")
-        barcode_handler = BarcodeHandler(driver, wait)
-        barcode_handler.process_all_products()
+        # 条码内容索引：合并已有的重复文件，新下载的条码内容未变化时不重复保存
+        # 先合并重复文件再读取断点记录，断点记录扫描目录时只会看到保留下来的文件
+        index = BarcodeIndex()
+        index.refresh()
+        journal = BarcodeJournal(JOURNAL_FILE)
+        try:
+            with span("barcode"):
+                if BARCODE_TABS > 1:
+                    MultiTabBarcodeRunner(driver, tabs=BARCODE_TABS, journal=journal, index=index,
+                                          block_resources=BLOCK_RESOURCES, waits=waits).run()
+                else:
+                    barcode_handler = BarcodeHandler(driver, wait, journal=journal, index=index, waits=waits)
+                    barcode_handler.process_all_products()
+        finally:
+            journal.close()
+            index.save()
         print("条码获取完成")
         
         # generator = LabelGenerator()
@@ -60,6 +119,10 @@ def main():
     except Exception as e:
         print(f"程序执行出错: {str(e)}")
     finally:
+        waits.print_summary()
+        # 各阶段耗时汇总，trace文件可在chrome://tracing或Perfetto中查看
+        tracer.print_summary()
+        tracer.write()
         # 关闭浏览器
         if driver:
             time.sleep(1200)
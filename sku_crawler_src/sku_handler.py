@@ -1,31 +1,59 @@
-import requests
 import json
 import time
 import logging
+import math
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Iterator, Tuple
+from http_transport import iter_cookies
+from log_utils import setup_queue_logging, remove_log_handlers
+from ndjson_sink import NdjsonWriter
+from rate_limiter import AdaptiveRateLimiter, RetryPolicy, get_limiter, request_with_retry
+
+DEFAULT_HEADERS = {
+    "accept": "*/*",
+    "accept-language": "zh-CN,zh;q=0.9",
+    "cache-control": "max-age=0",
+    "content-type": "application/json",
+    "mallid": "634418219677180",
+    "origin": "https://seller.kuajingmaihuo.com",
+    "priority": "u=1, i",
+    "referer": "https://seller.kuajingmaihuo.com/main/product/label",
+    "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"macOS"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+}
+
+PAGE_QUERY_PATH = "/bg-visage-mms/labelcode/pageQuery"
 
 class SkuHandler:
-    def __init__(self, session):
+    def __init__(self, session, log_mode: str = "verbose", body_sample_rate: float = 0.0,
+                 limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, recorder=None):
+        """
+        :param session: 已登录的HTTP客户端，通常由http_transport.create_session创建
+        :param log_mode: 日志模式，verbose记录完整请求/响应，compact每个请求只记录一行JSON
+        :param body_sample_rate: compact模式下记录完整响应体的抽样比例，请求失败时总会记录
+        :param limiter: 限速器，默认使用卖家中心域名共享的自适应限速器
+        :param retry_policy: 单次请求的重试策略
+        :param base_url: 接口地址，默认为卖家中心，压测时可指向本地回放服务器
+        :param recorder: PageQueryRecorder实例，设置后保存每次请求/响应用于回放
+        """
         self.session = session
-        self.base_url = "https://seller.kuajingmaihuo.com"
-        self.headers = {
-            "accept": "*/*",
-            "accept-language": "zh-CN,zh;q=0.9",
-            "cache-control": "max-age=0",
-            "content-type": "application/json",
-            "mallid": "634418219677180",
-            "origin": "https://seller.kuajingmaihuo.com",
-            "priority": "u=1, i",
-            "referer": "https://seller.kuajingmaihuo.com/main/product/label",
-            "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"macOS"',
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
-        }
+        self.log_mode = log_mode
+        self.body_sample_rate = body_sample_rate
+        self.base_url = base_url or "https://seller.kuajingmaihuo.com"
+        self.recorder = recorder
+        self.limiter = limiter or get_limiter(self.base_url)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.page_size = 50
+        self.headers = dict(DEFAULT_HEADERS)
         self._setup_logging()
 
     def _setup_logging(self):
@@ -37,11 +65,21 @@ class SkuHandler:
             
         # 生成日志文件名，包含时间戳
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = f'logs/sku_crawler_{timestamp}.log'
         
-        # 配置日志
+        # 配置日志；logger是进程内共用的，先移除之前的SkuHandler挂上的处理器，避免每条日志重复写入多个文件
         self.logger = logging.getLogger('sku_crawler')
+        remove_log_handlers(self.logger)
         self.logger.setLevel(logging.DEBUG)
+
+        if self.log_mode == "compact":
+            # 紧凑模式：每行一条JSON，由后台线程写入可轮转压缩的文件
+            # 逐条SKU的调试日志在该模式下不产生记录
+            self.logger.setLevel(logging.INFO)
+            log_file = f'logs/sku_crawler_{timestamp}.jsonl'
+            self.log_listener = setup_queue_logging(self.logger, log_file, level=logging.INFO)
+            return
+
+        log_file = f'logs/sku_crawler_{timestamp}.log'
         
         # 创建文件处理器
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
@@ -54,6 +92,16 @@ class SkuHandler:
         # 添加处理器到logger
         self.logger.addHandler(file_handler)
 
+    @property
+    def page_log_level(self) -> int:
+        """逐页的进度日志级别：compact模式下为DEBUG，不写入文件，每个请求只保留一行"""
+        return logging.DEBUG if self.log_mode == "compact" else logging.INFO
+
+    def close(self) -> None:
+        """用完后移除日志处理器，停止后台写日志的线程"""
+        if self.logger.handlers:
+            remove_log_handlers(self.logger)
+
     def set_cookies(self, cookies: str) -> None:
         """
         设置登录cookies
@@ -66,9 +114,9 @@ class SkuHandler:
                 key, value = item.strip().split('=', 1)
                 cookie_dict[key] = value
         
-        self.session.cookies.update(cookie_dict)
-        # 同时将cookies添加到请求头中
-        self.headers['Cookie'] = cookies
+        # cookies统一由session的cookie jar携带，不再手动拼Cookie请求头
+        for key, value in cookie_dict.items():
+            self.session.cookies.set(key, value)
         self.logger.info("Cookies已更新")
 
     def get_sku_list(self, page: int = 1, page_size: int = 50) -> Optional[Dict]:
@@ -78,13 +126,16 @@ class SkuHandler:
         :param page_size: 每页数量
         :return: 响应数据
         """
-        url = f"{self.base_url}/bg-visage-mms/labelcode/pageQuery"
+        url = f"{self.base_url}{PAGE_QUERY_PATH}"
         
         payload = {
             "page": page,
             "pageSize": page_size
         }
 
+        if self.log_mode == "compact":
+            return self._post_page_compact(url, payload)
+
         try:
             # 记录请求信息
             self.logger.info("\n=== 请求信息 ===")
@@ -98,16 +149,12 @@ class SkuHandler:
             self.logger.info(json.dumps(payload, ensure_ascii=False, indent=2))
             
             self.logger.info("\nCookies:")
-            for cookie in self.session.cookies:
+            for cookie in iter_cookies(self.session):
                 self.logger.info(f"{cookie.name}: {cookie.value}")
             
             self.logger.info("================\n")
 
-            response = self.session.post(
-                url, 
-                headers=self.headers,
-                json=payload
-            )
+            response = self._post(url, payload)
             
             if response.status_code == 200:
                 # 记录响应信息
@@ -118,11 +165,12 @@ class SkuHandler:
                 for key, value in response.headers.items():
                     self.logger.info(f"{key}: {value}")
                 
+                response_data = response.json()
                 self.logger.info("\n响应体:")
-                self.logger.info(json.dumps(response.json(), ensure_ascii=False, indent=2))
+                self.logger.info(json.dumps(response_data, ensure_ascii=False, indent=2))
                 self.logger.info("================\n")
                 
-                return response.json()
+                return response_data
             else:
                 self.logger.error(f"请求失败，状态码: {response.status_code}")
                 self.logger.error(f"响应内容: {response.text}")
@@ -131,6 +179,63 @@ class SkuHandler:
             self.logger.error(f"请求发生错误: {str(e)}")
             return None
 
+    def _post(self, url: str, payload: Dict):
+        """经过限速器发送POST请求，5xx、429和网络异常会按退避策略重试"""
+        start = time.perf_counter()
+        response = request_with_retry(
+            self.session, "POST", url,
+            limiter=self.limiter,
+            policy=self.retry_policy,
+            headers=self.headers,
+            json=payload
+        )
+        if self.recorder:
+            self.recorder.record(payload, response, time.perf_counter() - start)
+        return response
+
+    def _post_page_compact(self, url: str, payload: Dict) -> Optional[Dict]:
+        """
+        发送分页请求，只记录一行包含耗时、状态码和条目数的JSON日志
+        完整响应体按body_sample_rate抽样记录，请求失败时总是记录
+        """
+        fields = {'event': 'pageQuery', 'page': payload['page'], 'page_size': payload['pageSize']}
+        start = time.perf_counter()
+        try:
+            response = self._post(url, payload)
+        except Exception as e:
+            fields['ms'] = round((time.perf_counter() - start) * 1000, 1)
+            fields['error'] = str(e)
+            self.logger.error("请求发生错误", extra={'fields': fields})
+            return None
+
+        fields['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        fields['status'] = response.status_code
+        fields['bytes'] = len(response.content)
+
+        response_data = None
+        if response.status_code == 200:
+            try:
+                response_data = response.json()
+            except ValueError as e:
+                fields['error'] = f"响应不是合法JSON: {str(e)}"
+
+        ok = bool(response_data and response_data.get('success'))
+        if response_data is not None:
+            result = response_data.get('result') or {}
+            fields['success'] = response_data.get('success')
+            fields['total'] = result.get('total')
+            fields['items'] = len(result.get('pageItems') or [])
+
+        if not ok:
+            fields['body'] = response_data if response_data is not None else response.text
+            self.logger.error("请求失败", extra={'fields': fields})
+            return response_data
+
+        if self.body_sample_rate and random.random() < self.body_sample_rate:
+            fields['body'] = response_data
+        self.logger.info("请求完成", extra={'fields': fields})
+        return response_data
+
     def extract_product_sku_ids(self, response_data: Dict) -> List[str]:
         """
         从响应数据中提取productSkuId
@@ -147,58 +252,202 @@ class SkuHandler:
             # 获取result中的pageItems
             page_items = response_data.get('result', {}).get('pageItems', [])
             total = response_data.get('result', {}).get('total', 0)
-            self.logger.info(f"总记录数: {total}")
-            self.logger.info(f"当前页面记录数: {len(page_items)}")
+            self.logger.log(self.page_log_level, f"总记录数: {total}")
+            self.logger.log(self.page_log_level, f"当前页面记录数: {len(page_items)}")
 
             # 遍历每个商品项
             for item in page_items:
                 if 'labelCodeVO' in item and 'productSkuId' in item['labelCodeVO']:
                     sku_id = item['labelCodeVO']['productSkuId']
                     product_name = item.get('productName', 'Unknown')
-                    self.logger.info(f"提取SKU ID: {sku_id}, 商品名称: {product_name}")
+                    self.logger.debug(f"提取SKU ID: {sku_id}, 商品名称: {product_name}")
                     sku_ids.append(str(sku_id))  # 转换为字符串以保持一致性
 
         except Exception as e:
             self.logger.error(f"提取SKU ID时发生错误: {str(e)}")
             
-        self.logger.info(f"本页共提取到 {len(sku_ids)} 个SKU ID")
+        self.logger.log(self.page_log_level, f"本页共提取到 {len(sku_ids)} 个SKU ID")
         return sku_ids
 
-    def fetch_all_skus(self) -> List[str]:
+    def fetch_page_with_retry(self, page: int, max_retries: int = 3) -> Optional[Dict]:
+        """
+        获取单页数据，失败时只重试该页
+        HTTP层面的错误（5xx、429、网络异常）只由_post的RetryPolicy重试，重试后仍失败直接放弃；
+        这里只重试接口返回success为false的响应，避免两层重试叠加
+        :param page: 页码，从1开始
+        :param max_retries: success为false时的最大尝试次数
+        :return: 响应数据，失败时返回None
+        """
+        for attempt in range(1, max_retries + 1):
+            response_data = self.get_sku_list(page=page, page_size=self.page_size)
+            if response_data and response_data.get('success'):
+                return response_data
+            if response_data is None:
+                break
+
+            if attempt < max_retries:
+                delay = self.retry_policy.backoff(attempt)
+                self.logger.warning(f"第 {page} 页获取失败，{delay:.1f} 秒后进行第 {attempt + 1} 次尝试")
+                time.sleep(delay)
+
+        self.logger.error(f"第 {page} 页获取失败，已尝试 {attempt} 次")
+        return None
+
+    def iter_pages(self, max_workers: int = 4, max_retries: int = 3) -> Iterator[Tuple[int, Dict]]:
+        """
+        按页码顺序逐页产出响应数据
+        先请求第1页拿到总数，其余页面使用有界线程池并发获取；同时在途的页面数有上限，
+        内存占用与目录大小无关。获取失败的页码记录在self.failed_pages中
+        :param max_workers: 并发请求的最大线程数，为1时退化为逐页获取
+        :param max_retries: 单页最大尝试次数
+        :return: (页码, 响应数据)生成器
+        """
+        self.failed_pages = []
+        self.logger.log(self.page_log_level, "正在获取第 1 页数据...")
+        first_page = self.fetch_page_with_retry(1, max_retries=max_retries)
+        if not first_page:
+            self.logger.error("获取第 1 页数据失败")
+            self.failed_pages.append(1)
+            return
+
+        total = first_page.get('result', {}).get('total', 0)
+        total_pages = max(1, math.ceil(total / self.page_size))
+        self.logger.log(self.page_log_level, f"总记录数: {total}，共 {total_pages} 页")
+        yield 1, first_page
+
+        if total_pages > 1:
+            workers = max(1, min(max_workers, total_pages - 1))
+            window = workers * 2
+            self.logger.info(f"使用 {workers} 个线程并发获取剩余 {total_pages - 1} 页")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                next_page = 2
+                while next_page <= total_pages or pending:
+                    # 保持固定数量的页面在途，按提交顺序取结果以保证页码顺序
+                    while next_page <= total_pages and len(pending) < window:
+                        pending.append((next_page, executor.submit(self.fetch_page_with_retry, next_page, max_retries)))
+                        next_page += 1
+
+                    page, future = pending.popleft()
+                    try:
+                        response_data = future.result()
+                    except Exception as e:
+                        self.logger.error(f"第 {page} 页处理时发生错误: {str(e)}")
+                        response_data = None
+
+                    if not response_data:
+                        self.failed_pages.append(page)
+                        continue
+                    yield page, response_data
+
+        if self.failed_pages:
+            self.logger.error(f"以下页面获取失败: {self.failed_pages}")
+
+    def iter_sku_records(self, max_workers: int = 4, max_retries: int = 3) -> Iterator[Dict]:
+        """
+        逐条产出完整的pageItems记录，按页码顺序
+        :param max_workers: 并发请求的最大线程数
+        :param max_retries: 单页最大尝试次数
+        :return: pageItems记录生成器
+        """
+        for _, response_data in self.iter_pages(max_workers=max_workers, max_retries=max_retries):
+            yield from self.extract_page_items(response_data)
+
+    def stream_to_ndjson(self, filename: str = "sku_records.ndjson", max_workers: int = 4, max_retries: int = 3) -> int:
+        """
+        边翻页边把完整记录写入NDJSON文件，每页写完即刷新到磁盘，已有的文件会被覆盖
+        :param filename: 输出文件名
+        :param max_workers: 并发请求的最大线程数
+        :param max_retries: 单页最大尝试次数
+        :return: 写入的记录数
+        """
+        count = 0
+        # 每次都是完整导出，先清空文件，重复运行不会追加出第二份目录
+        with NdjsonWriter(filename, append=False) as writer:
+            for _, response_data in self.iter_pages(max_workers=max_workers, max_retries=max_retries):
+                count += writer.write_many(self.extract_page_items(response_data))
+        self.logger.info(f"共写入 {count} 条记录到: {filename}")
+        return count
+
+    def fetch_all_skus(self, max_workers: int = 4, max_retries: int = 3) -> List[str]:
         """
         获取所有SKU ID
-        :return: 所有的productSkuId列表
+        :param max_workers: 并发请求的最大线程数，为1时退化为逐页获取
+        :param max_retries: 单页最大尝试次数
+        :return: 所有的productSkuId列表，按页码顺序
         """
         all_sku_ids = []
+        for _, response_data in self.iter_pages(max_workers=max_workers, max_retries=max_retries):
+            all_sku_ids.extend(self.extract_product_sku_ids(response_data))
+
+        self.logger.info(f"获取完成，共获取到 {len(all_sku_ids)} 个SKU ID")
+        return all_sku_ids
+
+    def extract_page_items(self, response_data: Dict) -> List[Dict]:
+        """
+        从响应数据中提取带有productSkuId的完整pageItems记录
+        :param response_data: API响应数据
+        :return: pageItems记录列表
+        """
+        if not response_data.get('success'):
+            self.logger.error("响应表明请求失败")
+            return []
+        page_items = response_data.get('result', {}).get('pageItems', []) or []
+        return [
+            item for item in page_items
+            if 'productSkuId' in item.get('labelCodeVO', {})
+        ]
+
+    def sync_to_store(self, store, incremental: bool = True, max_retries: int = 3) -> Dict[str, List[str]]:
+        """
+        将SKU完整记录同步到本地存储
+        增量同步假定接口按最近更新排序：遇到整页都是已存储且未变化的记录时停止翻页；
+        若此时服务端总数与本地数量不一致，说明有SKU被删除，继续完整翻页以找出被删除的SKU
+        :param store: SkuStore实例
+        :param incremental: 是否增量同步，False时总是完整翻页
+        :param max_retries: 单页最大尝试次数
+        :return: {'added': [...], 'changed': [...], 'removed': [...]}
+        """
+        delta = {'added': [], 'changed': [], 'removed': []}
+        seen_sku_ids = set()
         page = 1
-        
+        completed = False
+
         while True:
-            self.logger.info(f"正在获取第 {page} 页数据...")
-            response_data = self.get_sku_list(page=page)
-            
+            self.logger.log(self.page_log_level, f"正在同步第 {page} 页数据...")
+            response_data = self.fetch_page_with_retry(page, max_retries=max_retries)
             if not response_data:
-                self.logger.error("获取页面数据失败")
+                self.logger.error(f"第 {page} 页同步失败，本次不处理删除的SKU")
                 break
-                
-            sku_ids = self.extract_product_sku_ids(response_data)
-            if not sku_ids:
-                self.logger.info("当前页面没有找到SKU ID")
-                break
-                
-            all_sku_ids.extend(sku_ids)
-            self.logger.info(f"当前已累计获取 {len(all_sku_ids)} 个SKU ID")
-            
-            # 检查是否还有下一页
+
+            records = self.extract_page_items(response_data)
+            page_delta = store.upsert_records(records)
+            delta['added'].extend(page_delta['added'])
+            delta['changed'].extend(page_delta['changed'])
+            seen_sku_ids.update(page_delta['added'] + page_delta['changed'] + page_delta['unchanged'])
+
             total = response_data.get('result', {}).get('total', 0)
-            if page * 50 >= total:
-                self.logger.info(f"已到达最后一页，总记录数: {total}")
+            if not records or page * self.page_size >= total:
+                completed = True
                 break
-                
+
+            if incremental and records and not page_delta['added'] and not page_delta['changed']:
+                if store.count() == total:
+                    self.logger.info(f"第 {page} 页记录均已存在且未变化，停止增量同步")
+                    break
+                self.logger.info(f"本地记录数 {store.count()} 与服务端总数 {total} 不一致，继续完整同步")
+                incremental = False
+
             page += 1
-            time.sleep(1)  # 添加延时，避免请求过快
-            
-        self.logger.info(f"获取完成，共获取到 {len(all_sku_ids)} 个SKU ID")
-        return all_sku_ids
+
+        if completed:
+            delta['removed'] = store.remove_missing(seen_sku_ids)
+
+        self.logger.info(
+            f"同步完成，新增 {len(delta['added'])} 个，变化 {len(delta['changed'])} 个，"
+            f"删除 {len(delta['removed'])} 个，本地共 {store.count()} 个SKU"
+        )
+        return delta
 
     @staticmethod
     def save_to_file(data: List[str], filename: str = "sku_ids.json") -> None:
@@ -0,0 +1,158 @@
+import sqlite3
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Iterable
+
+
+class SkuStore:
+    """基于SQLite的SKU本地存储，以productSkuId为主键保存完整的pageItems记录"""
+
+    def __init__(self, db_path: str = "sku_store.db"):
+        self.db_path = db_path
+        self.logger = logging.getLogger('sku_crawler')
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        """创建数据表和索引"""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS skus (
+                product_sku_id TEXT PRIMARY KEY,
+                product_skc_id TEXT,
+                product_id TEXT,
+                product_name TEXT,
+                label_code TEXT,
+                record_hash TEXT NOT NULL,
+                record TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_skus_skc ON skus (product_skc_id);
+            CREATE INDEX IF NOT EXISTS idx_skus_last_seen ON skus (last_seen);
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def record_hash(record: Dict) -> str:
+        """计算记录内容的哈希，用于判断记录是否发生变化"""
+        content = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def record_sku_id(record: Dict) -> Optional[str]:
+        """从pageItems记录中取出productSkuId"""
+        sku_id = record.get('labelCodeVO', {}).get('productSkuId')
+        return str(sku_id) if sku_id is not None else None
+
+    def get_hashes(self, sku_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量查询已存储记录的哈希
+        :param sku_ids: productSkuId列表
+        :return: {productSkuId: record_hash}，不存在的SKU不会出现在结果中
+        """
+        sku_ids = list(sku_ids)
+        if not sku_ids:
+            return {}
+        placeholders = ','.join('?' * len(sku_ids))
+        rows = self.conn.execute(
+            f"SELECT product_sku_id, record_hash FROM skus WHERE product_sku_id IN ({placeholders})",
+            sku_ids
+        ).fetchall()
+        return {row['product_sku_id']: row['record_hash'] for row in rows}
+
+    def upsert_records(self, records: List[Dict]) -> Dict[str, List[str]]:
+        """
+        写入一页记录，返回新增和变化的SKU
+        :param records: pageItems记录列表
+        :return: {'added': [...], 'changed': [...], 'unchanged': [...]}
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        keyed = {}
+        for record in records:
+            sku_id = self.record_sku_id(record)
+            if sku_id:
+                keyed[sku_id] = record
+
+        existing = self.get_hashes(keyed.keys())
+        result = {'added': [], 'changed': [], 'unchanged': []}
+
+        with self.conn:
+            for sku_id, record in keyed.items():
+                digest = self.record_hash(record)
+                if sku_id not in existing:
+                    result['added'].append(sku_id)
+                elif existing[sku_id] != digest:
+                    result['changed'].append(sku_id)
+                else:
+                    result['unchanged'].append(sku_id)
+                    self.conn.execute(
+                        "UPDATE skus SET last_seen = ? WHERE product_sku_id = ?",
+                        (now, sku_id)
+                    )
+                    continue
+
+                label_code_vo = record.get('labelCodeVO', {})
+                self.conn.execute("""
+                    INSERT INTO skus (product_sku_id, product_skc_id, product_id, product_name, label_code,
+                                      record_hash, record, first_seen, updated_at, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(product_sku_id) DO UPDATE SET
+                        product_skc_id = excluded.product_skc_id,
+                        product_id = excluded.product_id,
+                        product_name = excluded.product_name,
+                        label_code = excluded.label_code,
+                        record_hash = excluded.record_hash,
+                        record = excluded.record,
+                        updated_at = excluded.updated_at,
+                        last_seen = excluded.last_seen
+                """, (
+                    sku_id,
+                    str(label_code_vo.get('productSkcId', '')),
+                    str(record.get('productId', '')),
+                    record.get('productName', ''),
+                    str(label_code_vo.get('labelCode', '')),
+                    digest,
+                    json.dumps(record, ensure_ascii=False),
+                    now, now, now
+                ))
+
+        return result
+
+    def remove_missing(self, seen_sku_ids: Iterable[str]) -> List[str]:
+        """
+        删除本次完整同步中没有出现的SKU
+        :param seen_sku_ids: 本次同步见到的全部productSkuId
+        :return: 被删除的productSkuId列表
+        """
+        removed = sorted(set(self.all_sku_ids()) - set(seen_sku_ids))
+        if removed:
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM skus WHERE product_sku_id = ?",
+                    [(sku_id,) for sku_id in removed]
+                )
+        return removed
+
+    def all_sku_ids(self) -> List[str]:
+        """返回所有已存储的productSkuId"""
+        rows = self.conn.execute("SELECT product_sku_id FROM skus ORDER BY rowid").fetchall()
+        return [row['product_sku_id'] for row in rows]
+
+    def get_record(self, sku_id: str) -> Optional[Dict]:
+        """获取单个SKU的完整记录"""
+        row = self.conn.execute(
+            "SELECT record FROM skus WHERE product_sku_id = ?", (str(sku_id),)
+        ).fetchone()
+        return json.loads(row['record']) if row else None
+
+    def count(self) -> int:
+        """返回已存储的SKU数量"""
+        return self.conn.execute("SELECT COUNT(*) FROM skus").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
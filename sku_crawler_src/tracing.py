@@ -0,0 +1,146 @@
+import os
+import json
+import math
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数，values为空时返回0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Tracer:
+    """
+    轻量的分段计时
+    每个span记录为Chrome trace-event格式的完整事件（ph=X），可在chrome://tracing或Perfetto中打开；
+    cat为"sku"的span表示单个SKU的处理，汇总时额外给出p50/p95
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+
+    def _now_us(self):
+        return (time.perf_counter() - self.start) * 1e6
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        """
+        记录一段代码的耗时
+        :param name: 阶段名称
+        :param cat: 分类，"sku"表示单个SKU
+        :param args: 附加信息，可在with块内通过返回的dict继续补充
+        """
+        begin = self._now_us()
+        try:
+            yield args
+        finally:
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round(begin, 1),
+                "dur": round(self._now_us() - begin, 1),
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": args
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def record(self, name, seconds, cat="stage", **args):
+        """记录在其他进程中测得的耗时，结束时间为当前时刻"""
+        end = self._now_us()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round(end - seconds * 1e6, 1),
+            "dur": round(seconds * 1e6, 1),
+            "pid": args.pop("pid", self.pid),
+            "tid": args.pop("tid", 0),
+            "args": args
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def traced(self, name, cat="stage"):
+        """把整个函数记录为一个span的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*a, **kw):
+                with self.span(name, cat):
+                    return func(*a, **kw)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """
+        按阶段汇总
+        :return: {name: {'count', 'total', 'p50', 'p95', 'cat'}}，时间单位为秒
+        """
+        with self.lock:
+            events = list(self.events)
+        grouped = {}
+        for event in events:
+            grouped.setdefault(event["name"], (event["cat"], []))[1].append(event["dur"] / 1e6)
+        return {
+            name: {
+                "cat": cat,
+                "count": len(durations),
+                "total": sum(durations),
+                "p50": percentile(durations, 50),
+                "p95": percentile(durations, 95)
+            }
+            for name, (cat, durations) in grouped.items()
+        }
+
+    def print_summary(self):
+        """打印每个阶段的总耗时，单个SKU的阶段附带p50/p95"""
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"\n{'阶段':<24}{'次数':>6}{'总耗时(s)':>12}{'p50(s)':>10}{'p95(s)':>10}")
+        for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            line = f"{name:<24}{stats['count']:>6}{stats['total']:>12.2f}"
+            if stats["cat"] == "sku":
+                line += f"{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+            print(line)
+
+    def write(self, trace_dir="traces"):
+        """
+        写出trace文件
+        :return: 文件路径，没有记录时返回None
+        """
+        with self.lock:
+            events = list(self.events)
+        if not events:
+            return None
+        if not os.path.exists(trace_dir):
+            os.makedirs(trace_dir)
+        path = os.path.join(trace_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        print(f"trace已保存: {path}")
+        return path
+
+    def reset(self):
+        with self.lock:
+            self.events = []
+        self.start = time.perf_counter()
+
+
+# 进程内共用的tracer，各处理器直接使用span/traced
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
@@ -0,0 +1,128 @@
+import re
+import time
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# 页面就绪且最近idle_ms毫秒内没有新的资源请求完成
+NETWORK_IDLE_JS = """
+var idleMs = arguments[0];
+if (document.readyState !== 'complete') return false;
+var last = 0;
+var nav = performance.getEntriesByType('navigation')[0];
+if (nav) last = nav.responseEnd;
+performance.getEntriesByType('resource').forEach(function(r) {
+    if (r.responseEnd > last) last = r.responseEnd;
+});
+return performance.now() - last >= idleMs;
+"""
+
+
+def document_ready():
+    """document.readyState为complete"""
+    return lambda d: d.execute_script("return document.readyState") == "complete"
+
+
+def network_idle(idle_ms=500):
+    """页面加载完成且一段时间内没有新的网络请求"""
+    return lambda d: d.execute_script(NETWORK_IDLE_JS, idle_ms)
+
+
+def element_present(locator):
+    """元素出现在DOM中"""
+    return EC.presence_of_element_located(locator)
+
+
+def element_clickable(locator):
+    """元素可见且可点击"""
+    return EC.element_to_be_clickable(locator)
+
+
+def element_gone(locator):
+    """元素不存在或全部不可见"""
+    def condition(d):
+        return all(not el.is_displayed() for el in d.find_elements(*locator))
+    return condition
+
+
+def url_matches(pattern):
+    """当前URL匹配正则"""
+    return lambda d: re.search(pattern, d.current_url) is not None
+
+
+def url_changes(old_url):
+    """当前URL与old_url不同"""
+    return lambda d: d.current_url != old_url
+
+
+def js_true(script, *args):
+    """JavaScript返回真值"""
+    return lambda d: d.execute_script(script, *args)
+
+
+def any_of(*conditions):
+    """任一条件满足即返回该条件的结果"""
+    def condition(d):
+        for cond in conditions:
+            result = cond(d)
+            if result:
+                return result
+        return False
+    return condition
+
+
+def all_of(*conditions):
+    """所有条件都满足"""
+    return lambda d: all(cond(d) for cond in conditions)
+
+
+class WaitPolicy:
+    """
+    用显式的就绪条件替代固定sleep
+    每个等待有自己的超时和轮询间隔，并记录实际耗时，便于查看时间花在哪里
+    """
+
+    def __init__(self, driver, default_timeout=10, default_poll=0.1):
+        self.driver = driver
+        self.default_timeout = default_timeout
+        self.default_poll = default_poll
+        self.records = []
+
+    def until(self, name, condition, timeout=None, poll=None, required=True):
+        """
+        等待条件满足
+        :param name: 等待的名称，用于统计
+        :param condition: 接收driver的可调用对象，返回真值表示就绪
+        :param timeout: 超时秒数
+        :param poll: 轮询间隔秒数
+        :param required: 为True时超时抛出TimeoutException，否则返回None
+        :return: 条件的返回值
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        poll = self.default_poll if poll is None else poll
+        start = time.perf_counter()
+        try:
+            result = WebDriverWait(
+                self.driver, timeout, poll_frequency=poll,
+                ignored_exceptions=(StaleElementReferenceException,)
+            ).until(condition)
+            self.records.append((name, time.perf_counter() - start, True))
+            return result
+        except TimeoutException:
+            self.records.append((name, time.perf_counter() - start, False))
+            if required:
+                raise TimeoutException(f"等待超时: {name} ({timeout}s)")
+            return None
+
+    def total(self):
+        """所有等待的总耗时（秒）"""
+        return sum(seconds for _, seconds, _ in self.records)
+
+    def print_summary(self):
+        """打印每个等待的实际耗时"""
+        if not self.records:
+            return
+        print(f"\n{'等待':<24}{'耗时(s)':>10}{'结果':>8}")
+        for name, seconds, ok in self.records:
+            print(f"{name:<24}{seconds:>10.2f}{'就绪' if ok else '超时':>8}")
+        print(f"{'合计':<24}{self.total():>10.2f}")